@@ -0,0 +1,190 @@
+"""
+Studienübergreifende Auswertung aller Antworten (für Forscher, nicht für Teilnehmer).
+
+    python analytics.py                    # Tabellen ausgeben
+    python analytics.py --out auswertung   # zusätzlich als CSV speichern
+"""
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from result_store import CSV_SEP, RENAMED_COLUMNS, RESULT_COLUMNS
+from video_catalog import generator_from_filename
+
+# ==========================================================
+# 📊 ANALYSE (spaltenbasiert, inkrementell)
+# ==========================================================
+DATA_FOLDER = "studien_daten"
+SNAPSHOT_NAME = "ergebnisse.parquet"
+# Stand (letzte rowid) steht in den Parquet-Metadaten: Daten und Stand werden mit
+# einem os.replace gemeinsam getauscht, ein Abbruch dazwischen ist nicht möglich
+STATE_KEY = b"studie.last_rowid"
+
+class ResultFrame:
+    """
+    Alle Antworten als ein DataFrame, zwischengespeichert als Parquet-Snapshot.
+    Bei jedem load() werden nur die seit dem letzten Mal neu hinzugekommenen
+    Zeilen aus ergebnisse.sqlite (rowid > letzter Stand) nachgeladen.
+    """
+
+    def __init__(self, data_folder=DATA_FOLDER, cache_folder=None):
+        self.data_folder = data_folder
+        self.cache_folder = cache_folder or os.path.join(data_folder, "analytics")
+        self.sqlite_path = os.path.join(data_folder, "ergebnisse.sqlite")
+        self.csv_path = os.path.join(data_folder, "ergebnisse.csv")
+
+    def _snapshot(self):
+        path = os.path.join(self.cache_folder, SNAPSHOT_NAME)
+        if not os.path.isfile(path):
+            return pd.DataFrame(columns=RESULT_COLUMNS), 0
+        table = pq.read_table(path)
+        last_rowid = (table.schema.metadata or {}).get(STATE_KEY)
+        if last_rowid is None:
+            # Snapshot ohne Stand (ältere Version) -> neu aufbauen
+            return pd.DataFrame(columns=RESULT_COLUMNS), 0
+        return table.to_pandas(), int(last_rowid)
+
+    def _save_snapshot(self, df, last_rowid):
+        os.makedirs(self.cache_folder, exist_ok=True)
+        path = os.path.join(self.cache_folder, SNAPSHOT_NAME)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), STATE_KEY: str(int(last_rowid)).encode()})
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def load(self):
+        if not os.path.isfile(self.sqlite_path):
+            # Ohne SQLite-Index: einmal die ganze CSV lesen (kein inkrementeller Stand)
+            if not os.path.isfile(self.csv_path):
+                return _prepare(pd.DataFrame(columns=RESULT_COLUMNS))
+            return _prepare(pd.read_csv(self.csv_path, sep=CSV_SEP))
+
+        df, last_rowid = self._snapshot()
+        cols = ", ".join(f'"{c}"' for c in RESULT_COLUMNS)
+        with sqlite3.connect(self.sqlite_path, timeout=30) as conn:
+            new = pd.read_sql_query(
+                f"SELECT rowid AS _rowid, {cols} FROM ergebnisse WHERE rowid > ? ORDER BY rowid",
+                conn, params=(last_rowid,),
+            )
+        if not new.empty:
+            last_rowid = int(new["_rowid"].iloc[-1])
+            new = _prepare(new.drop(columns="_rowid"))
+            df = new if df.empty else pd.concat([df, new], ignore_index=True)
+            self._save_snapshot(df, last_rowid)
+        return _prepare(df)
+
+
+def _prepare(df):
+    """Einheitliche Typen + abgeleitete Spalten (Generator), kategorisch für schnelle groupbys."""
+    df = df.copy()
+    df["Erfolg"] = pd.to_numeric(df["Erfolg"], errors="coerce").fillna(0).astype("int8")
+    # Alte Spaltennamen (Snapshot, CSV) übernehmen; ganz alte Daten haben die Spalte gar nicht
+    for old, new in RENAMED_COLUMNS.items():
+        if old in df.columns:
+            df[new] = df[new].fillna(df[old]) if new in df.columns else df[old]
+            df = df.drop(columns=old)
+    for col in ("Zeit_bis_Bewertung", "Abspieldauer"):
+        df[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else np.nan
+    df["Korrektes_Label"] = df["Korrektes_Label"].astype(str).str.lower()
+    if "Generator" not in df.columns or df["Generator"].isna().any():
+        # Pro eindeutigem Video nur einmal parsen
+        videos = df[["Video", "Korrektes_Label"]].drop_duplicates()
+        gen = {
+            (v, l): generator_from_filename(v, l)
+            for v, l in zip(videos["Video"], videos["Korrektes_Label"])
+        }
+        df["Generator"] = [gen[k] for k in zip(df["Video"], df["Korrektes_Label"])]
+    for col in ("Gruppe", "Korrektes_Label", "Generator", "Video", "SessionID", "Testperson"):
+        df[col] = df[col].astype(str).astype("category")
+    return df
+
+
+def bootstrap_ci(df, by, n_boot=2000, alpha=0.05, seed=0):
+    """
+    Konfidenzintervalle für die Trefferquote je Gruppe 'by', per Cluster-Bootstrap
+    über Sessions (Antworten einer Person sind nicht unabhängig). Vektorisiert:
+    pro Gruppe eine (n_boot x Sessions)-Stichprobenmatrix.
+    """
+    rng = np.random.default_rng(seed)
+    per_session = (
+        df.groupby([by, "SessionID"], observed=True)["Erfolg"].agg(["sum", "count"]).reset_index()
+    )
+    rows = []
+    for key, part in per_session.groupby(by, observed=True):
+        hits = part["sum"].to_numpy(dtype=float)
+        counts = part["count"].to_numpy(dtype=float)
+        idx = rng.integers(0, len(part), size=(n_boot, len(part)))
+        rates = hits[idx].sum(axis=1) / counts[idx].sum(axis=1)
+        lo, hi = np.quantile(rates, [alpha / 2, 1 - alpha / 2])
+        rows.append({by: key, "ci_low": lo, "ci_high": hi})
+    return pd.DataFrame(rows, columns=[by, "ci_low", "ci_high"])
+
+
+def _rate_table(df, by, n_boot):
+    table = df.groupby(by, observed=True).agg(
+        trefferquote=("Erfolg", "mean"),
+        antworten=("Erfolg", "size"),
+        sessions=("SessionID", "nunique"),
+    ).reset_index()
+    if n_boot:
+        table = table.merge(bootstrap_ci(df, by, n_boot=n_boot), on=by, how="left")
+    return table
+
+
+def group_accuracy(df, n_boot=2000):
+    """Trefferquote je Studiengruppe (720p_mit_ton / 1080p_mit_ton / 720p_ohne_ton)."""
+    return _rate_table(df, "Gruppe", n_boot)
+
+
+def generator_detection(df, n_boot=2000):
+    """Erkennungsrate je Generator (bei 'Echt': Anteil korrekt als echt erkannt)."""
+    return _rate_table(df, "Generator", n_boot).sort_values("trefferquote")
+
+
+def video_difficulty(df):
+    """Schwierigkeit je Video und Gruppe: 1 - Trefferquote (höher = schwerer)."""
+    table = df.groupby(["Gruppe", "Video", "Korrektes_Label", "Generator"], observed=True).agg(
+        trefferquote=("Erfolg", "mean"),
+        antworten=("Erfolg", "size"),
+        zeit_bis_bewertung=("Zeit_bis_Bewertung", "mean"),
+        abspieldauer=("Abspieldauer", "mean"),
+    ).reset_index()
+    table["schwierigkeit"] = 1 - table["trefferquote"]
+    return table.sort_values("schwierigkeit", ascending=False)
+
+
+def run_all(df, n_boot=2000):
+    return {
+        "gruppen": group_accuracy(df, n_boot),
+        "generatoren": generator_detection(df, n_boot),
+        "videos": video_difficulty(df),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Studienübergreifende Auswertung der Deepfake-Studie")
+    parser.add_argument("--data", default=DATA_FOLDER, help="Datenordner (Standard: studien_daten)")
+    parser.add_argument("--out", help="Ordner für die Ergebnis-CSVs")
+    parser.add_argument("--bootstrap", type=int, default=2000, help="Bootstrap-Stichproben (0 = aus)")
+    args = parser.parse_args(argv)
+
+    df = ResultFrame(args.data).load()
+    if df.empty:
+        print("Keine Ergebnisse vorhanden.")
+        return
+    tables = run_all(df, n_boot=args.bootstrap)
+    for name, table in tables.items():
+        print(f"\n=== {name} ===")
+        print(table.to_string(index=False))
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            table.to_csv(os.path.join(args.out, f"{name}.csv"), index=False, sep=CSV_SEP)
+
+
+if __name__ == "__main__":
+    main()
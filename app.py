@@ -1,22 +1,88 @@
 import streamlit as st
 import pandas as pd
 import os
+import sys
 import time
+import math
+import threading
 from datetime import datetime
-from sklearn.metrics import accuracy_score, roc_curve, auc, confusion_matrix, ConfusionMatrixDisplay
-import matplotlib.pyplot as plt
 import uuid
-
-# Google Sheets Library
-from streamlit_gsheets import GSheetsConnection
+import cProfile
+import io
+import logging
+from streamlit import runtime
+
+from video_catalog import VideoCatalog
+from media_server import start_media_server, video_url
+from playback_reporter import playback_event
+from playlist import PlaylistGenerator
+from metrics import METRICS, start_metrics_server
+from session_records import Answer, answers_frame, answers_to_rows
+from result_store import BufferedResultWriter, SummaryStore, make_result_sink
+from id_allocator import FileCounterBackend, GroupBalancer, IdAllocator, SqliteCounterBackend
+from session_store import make_session_store
+from cloud_sync import (
+    DUPLICATE, FAILED, PENDING, UPLOADED,
+    BackgroundSync, CircuitBreaker, GSheetsBackend, LocalSheetBackend, SheetsUploader, UploadJobStore, UploadLog,
+)
+
+# sklearn, matplotlib und streamlit_gsheets werden erst bei Bedarf geladen
+# (Ergebnisseite bzw. Cloud-Zugriff) – jeder Script-Run startet hier oben.
+
+logger = logging.getLogger("studie")
 
 # ==========================================================
 # ⚙️ KONFIGURATION
 # ==========================================================
-ANZAHL_VIDEOS = 60
-DATA_FOLDER = "studien_daten"
+ANZAHL_VIDEOS = int(os.environ.get("ANZAHL_VIDEOS", "60"))  # per Env nur für Lasttests verkleinern
+SICHTDAUER_SEKUNDEN = 20  # Zeitlimit pro Video (ab dem Moment, in dem es im Browser anläuft)
+PLAYBACK_WAIT_SECONDS = 10  # kommt bis dahin keine Meldung "läuft" aus dem Browser, zählt der Countdown trotzdem
+DATA_FOLDER = os.environ.get("STUDY_DATA_DIR", "studien_daten")
 VIDEO_ROOT = "videos"  # Der Hauptordner
 
+# ERGEBNIS-SPEICHER: "csv", "sqlite", "parquet" oder kombiniert, z.B. "csv,sqlite".
+# Standard: CSV für die Auswertung + SQLite mit SessionID-Index für den Restore.
+RESULT_SINK = os.environ.get("RESULT_SINK", "csv,sqlite")
+RESULT_FSYNC = os.environ.get("RESULT_FSYNC", "always")  # "always" oder "never"
+
+# VIDEO-AUSLIEFERUNG
+# "streamlit": st.video(Pfad) über Streamlits Media-File-Manager (Standard)
+# "range":     eigener Media-Server mit HTTP-Range, ETag und Cache-Control.
+#              MEDIA_BASE_URL muss die Adresse sein, unter der der Browser den
+#              Server erreicht (z.B. hinter einem Reverse-Proxy).
+VIDEO_SERVING = os.environ.get("VIDEO_SERVING", "streamlit")
+MEDIA_SERVER_HOST = os.environ.get("MEDIA_SERVER_HOST", "127.0.0.1")  # nur lokal; nach außen über den Proxy
+MEDIA_SERVER_PORT = int(os.environ.get("MEDIA_SERVER_PORT", "8502"))
+MEDIA_BASE_URL = os.environ.get("MEDIA_BASE_URL", f"http://localhost:{MEDIA_SERVER_PORT}")
+VIDEO_CACHE_ENTRIES = 64  # Clips, deren Datei-Cache (OS) schon vorgewärmt wurde (range)
+FIGURE_CACHE_ENTRIES = 256  # Ergebnis-Grafiken (pro Session) im Cache
+
+# CLOUD: "gsheets" (st.connection) oder "local" (CSV-Ersatz in studien_daten/lokale_cloud)
+CLOUD_BACKEND = os.environ.get("CLOUD_BACKEND", "gsheets")
+
+# PROFILING: ?profile=1 schaltet cProfile für eine Session ein – nur, wenn der Server
+# mit PROFILING_ENABLED=1 läuft (sonst könnte jeder Teilnehmer profilen)
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED") == "1"
+PROFILE_MAX_SECONDS = 120  # verwaiste Profiler (Tab zu) spätestens dann beenden
+
+# OFFLINE-BETRIEB: nach so vielen Fehlern in Folge gilt die Cloud als ausgefallen
+# und wird CLOUD_RETRY_SECONDS lang nicht mehr gefragt (Uploads warten in der Outbox)
+CLOUD_FAILURE_THRESHOLD = 3
+CLOUD_RETRY_SECONDS = 30.0
+
+# ID-VERGABE: "sqlite" (Zähler in studien_daten/zuteilung.sqlite) oder "file" (Textdatei + Lock)
+ID_BACKEND = os.environ.get("ID_BACKEND", "sqlite")
+
+# MEHRERE PROZESSE AUF EINEM RECHNER (z.B. hinter einem lokalen Load-Balancer):
+# Mit STATE_BACKEND=sqlite liegen Fortschritt und Antworten jeder Session zusätzlich in
+# studien_daten/sessions.sqlite, damit ein Restore-Link in jedem Prozess funktioniert
+# (STUDY_DATA_DIR für alle Prozesse auf denselben Ordner setzen).
+# Standard "none": ein Prozess, kein zusätzlicher Schreibzugriff pro Klick.
+# Mehrere Hosts werden nicht unterstützt: Zähler, Gruppen-Balance, Outbox und
+# Ergebnis-Sink sind SQLite im WAL-Modus und gehören nicht auf ein Netzlaufwerk.
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "none")
+ID_BLOCK_SIZE = 10  # IDs, die ein Prozess auf einmal reserviert
+
 # MAPPING: Ordnername auf Festplatte -> Gruppenname im Code
 # (Basiert auf deinen Screenshots)
 FOLDER_TO_GROUP_MAPPING = {
@@ -35,65 +101,287 @@ GRUPPEN_MAPPING = {
 # ==========================================================
 # 📂 ORDNER MANAGEMENT & SCAN-LOGIK
 # ==========================================================
-if not os.path.exists(DATA_FOLDER):
-    os.makedirs(DATA_FOLDER)
+@st.cache_resource
+def _prepare_data_folder():
+    """Einmal pro Prozess statt bei jedem Script-Run."""
+    os.makedirs(DATA_FOLDER, exist_ok=True)
+    return DATA_FOLDER
+
+_prepare_data_folder()
+
+@st.cache_resource
+def _get_video_catalog():
+    """Ein Katalog pro Server-Prozess (statt einem Ordner-Scan pro Session)."""
+    return VideoCatalog(VIDEO_ROOT, FOLDER_TO_GROUP_MAPPING, manifest_path=os.path.join(DATA_FOLDER, "video_katalog.json"))
+
+@st.cache_resource(max_entries=2)
+def _catalog_frame(version):
+    # Der DataFrame wird nur neu gebaut, wenn sich der Katalog geändert hat (version)
+    return pd.DataFrame(_get_video_catalog().refresh())
 
 def scan_video_folders():
     """
     Ersetzt die metadata.csv.
-    Scannt die Ordner 'videos/GRUPPE/Real' und 'videos/GRUPPE/Fake'.
+    Liefert alle Videos aus 'videos/GRUPPE/Real' und 'videos/GRUPPE/Fake' aus dem
+    gecachten Katalog (inkl. Größe, Dauer, Codec und SHA-256 je Clip).
     """
-    video_list = []
-    
     if not os.path.exists(VIDEO_ROOT):
         st.error(f"Kritischer Fehler: Der Ordner '{VIDEO_ROOT}' wurde nicht gefunden!")
         return pd.DataFrame()
 
-    # Wir gehen durch die definierten Gruppen-Ordner
-    for folder_name, group_label in FOLDER_TO_GROUP_MAPPING.items():
-        group_path = os.path.join(VIDEO_ROOT, folder_name)
-        
-        # Prüfen, ob der Gruppenordner existiert
-        if os.path.exists(group_path):
-            # Wir suchen nach "Real" und "Fake" Unterordnern (Großschreibung beachten!)
-            for label in ["Real", "Fake"]:
-                label_path = os.path.join(group_path, label)
-                
-                if os.path.exists(label_path):
-                    # Alle Dateien im Ordner auflisten
-                    for file in os.listdir(label_path):
-                        # Nur Videodateien beachten
-                        if file.lower().endswith(('.mp4', '.mov', '.avi', '.mkv')):
-                            video_list.append({
-                                "filename": file,
-                                # Wir speichern den Pfad relativ zum videos-Ordner
-                                "full_path": os.path.join(folder_name, label, file),
-                                "label": label.lower(), # 'real' oder 'fake'
-                                "gruppe": group_label
-                            })
-    
-    return pd.DataFrame(video_list)
+    with METRICS.timed("catalog_scan", st.session_state.get("session_id")):
+        catalog = _get_video_catalog()
+        catalog.refresh()
+        return _catalog_frame(catalog.version)
+
+@st.cache_resource
+def _get_media_server():
+    """
+    Startet den Range-Media-Server einmal pro Rechner: bei mehreren Prozessen
+    bekommt nur der erste den Port, die anderen nutzen dessen Server mit
+    (gleicher Katalog, gleiche media_keys) und starten keinen eigenen.
+    """
+    # Nur Katalog-Clips, adressiert über ihren media_key (kein Pfad mit Real/Fake in der URL)
+    try:
+        return start_media_server(VIDEO_ROOT, _get_video_catalog().path_for_key, host=MEDIA_SERVER_HOST, port=MEDIA_SERVER_PORT)
+    except OSError as e:
+        logger.info("Media-Server auf Port %s nicht gestartet (%s) – läuft vermutlich in einem anderen Prozess", MEDIA_SERVER_PORT, e)
+        return None
+
+@st.cache_resource(max_entries=VIDEO_CACHE_ENTRIES)
+def _warm_page_cache(full_path, mtime_ns):
+    """Liest die Datei einmal im Hintergrund, damit der Media-Server sie aus dem OS-Cache liefert."""
+    def _read():
+        try:
+            with open(os.path.join(VIDEO_ROOT, full_path), "rb") as f:
+                while f.read(1024 * 1024): pass
+        except OSError: pass
+    thread = threading.Thread(target=_read, daemon=True)
+    thread.start()
+    return thread
+
+def _video_source(video):
+    """URL (range) bzw. Dateipfad (streamlit) für st.video – None, wenn die Datei fehlt."""
+    full_path = video['full_path']
+    video_path = os.path.join(VIDEO_ROOT, full_path)
+    try: mtime_ns = os.stat(video_path).st_mtime_ns
+    except OSError: return None
+    if VIDEO_SERVING == "range":
+        _get_media_server()
+        _warm_page_cache(full_path, mtime_ns)
+        return video_url(MEDIA_BASE_URL, video['media_key'])
+    # Kein eigener Byte-Cache: Streamlits Media-File-Manager hält den Clip ohnehin
+    # (einmal pro Inhalt) im RAM und vergibt eine undurchsichtige /media/<hash>-URL
+    return video_path
+
+def show_video(video):
+    """Zeigt einen Clip (Katalog-Zeile) an – je nach VIDEO_SERVING per Range-URL oder über Streamlit."""
+    source = _video_source(video)
+    if source is None:
+        # Kein Pfad in der Meldung: der enthält Real/Fake
+        st.error("Video nicht gefunden. Bitte die Studienleitung informieren.")
+        return
+    st.video(source)
+
+def _streamlit_media_url(video_path):
+    """
+    /media/<hash>-URL, unter der Streamlit die Datei ausliefert – dieselbe, die
+    st.video später für den gleichen Inhalt vergibt. Registriert unter eigenen
+    Koordinaten, damit der Clip bis zur Viewing-Phase im Media-File-Manager bleibt.
+    """
+    if not runtime.exists(): return None
+    return runtime.get_instance().media_file_mgr.add(video_path, "video/mp4", "prefetch")
+
+def prefetch_video(video):
+    """
+    Wärmt den nächsten Clip vor, während der aktuelle bewertet wird:
+    serverseitig (Media-File-Manager bzw. Datei im OS-Cache) und clientseitig
+    (unsichtbares <video preload="auto"> mit der späteren URL, damit der Browser
+    schon lädt). Die URL ist in beiden Modi undurchsichtig – im DOM steht kein
+    Pfad mit Real/Fake.
+    """
+    source = _video_source(video)
+    if source is None: return
+    url = source if VIDEO_SERVING == "range" else _streamlit_media_url(source)
+    if not url: return
+    st.markdown(prefetch_css, unsafe_allow_html=True)
+    with st.container(key="prefetch"):
+        st.markdown(f'<video src="{url}" preload="auto" muted playsinline></video>', unsafe_allow_html=True)
+
+@st.cache_resource
+def _get_result_writer():
+    """Ein gepufferter Writer (eigener Thread) pro Server-Prozess."""
+    return BufferedResultWriter(make_result_sink(RESULT_SINK, DATA_FOLDER, fsync=RESULT_FSYNC))
+
+def _gsheets_connection():
+    from streamlit_gsheets import GSheetsConnection
+    return st.connection("gsheets", type=GSheetsConnection)
+
+@st.cache_resource
+def _get_sheet_backend():
+    """Google-Tabelle oder (CLOUD_BACKEND=local) eine lokale Ersatz-Tabelle."""
+    if CLOUD_BACKEND == "local":
+        return LocalSheetBackend(os.path.join(DATA_FOLDER, "lokale_cloud"))
+    # Verbindung erst beim ersten Upload: ein Ausfall blockiert so weder Start noch Ergebnisseite
+    return GSheetsBackend(connect=_gsheets_connection)
+
+@st.cache_resource
+def _get_sheets_uploader():
+    """Uploader mit Circuit-Breaker: ist die Cloud ausgefallen, wird sie eine Weile nicht gefragt."""
+    upload_log = UploadLog(os.path.join(DATA_FOLDER, "cloud_sync.sqlite"))
+    return SheetsUploader(_get_sheet_backend(), upload_log, breaker=CircuitBreaker(CLOUD_FAILURE_THRESHOLD, CLOUD_RETRY_SECONDS))
+
+@st.cache_resource
+def _get_outbox():
+    """Lokale Outbox (ausstehende Uploads, offline vergebene IDs) in cloud_sync.sqlite."""
+    return UploadJobStore(os.path.join(DATA_FOLDER, "cloud_sync.sqlite"))
+
+@st.cache_resource
+def _get_background_sync():
+    """Thread-Pool + Abgleich-Thread, der die Outbox gesammelt nachholt – einmal pro Prozess."""
+    with_ids = CLOUD_BACKEND == "gsheets"
+    return BackgroundSync(
+        _get_sheets_uploader(), _get_outbox(), retry_interval=CLOUD_RETRY_SECONDS,
+        id_seeder=_cloud_last_id if with_ids else None,
+        allocator=_get_id_allocator() if with_ids else None,
+    )
+
+@st.cache_resource(max_entries=2)
+def _playlist_generator(version):
+    """Strata (Gruppe/Label/Generator) einmal pro Katalog-Version vorberechnen."""
+    return PlaylistGenerator(_get_video_catalog().refresh())
+
+@st.cache_resource(max_entries=2)
+def _path_rows(version):
+    """full_path -> Zeile im Katalog-DataFrame dieser Version."""
+    return {entry["full_path"]: row for row, entry in enumerate(_get_video_catalog().refresh())}
+
+def _missing_clip(full_path):
+    """Ersatz-Zeile für einen Clip, der nicht mehr im Katalog ist (Name + Label stehen im Pfad)."""
+    parts = full_path.replace("\\", "/").split("/")
+    return pd.Series({"filename": parts[-1], "label": parts[-2].lower(), "full_path": full_path, "media_key": None})
+
+def _current_playlist():
+    """
+    Katalog-Zeilen der Session-Playlist (None für einen Clip, den es nicht mehr gibt).
+    Im Session-State stehen die Pfade der Clips relativ zum videos-Ordner – die
+    bleiben auch bei einem Re-Encode gleich (anders als media_key/SHA-256). Ändert
+    sich der Katalog während der Session, bleibt die Reihenfolge gleich: gezeigte
+    Clips und der aktuelle bleiben stehen, nur gelöschte spätere fallen heraus.
+    Nur wenn die Playlist fehlt (Restore), wird sie aus Gruppe + Seed + Teilnehmer
+    neu berechnet.
+    """
+    catalog = _get_video_catalog()
+    entries = catalog.refresh()
+    if st.session_state.playlist is None:
+        indices = _playlist_generator(catalog.version).playlist(
+            st.session_state.group_name, ANZAHL_VIDEOS, st.session_state.seed,
+            participant=_parse_int(st.session_state.user_name, 0),
+        )
+        st.session_state.playlist = tuple(entries[i]["full_path"] for i in indices)
+        st.session_state.playlist_version = catalog.version
+    rows = _path_rows(catalog.version)
+    if st.session_state.playlist_version != catalog.version:
+        # Gezeigte Positionen und der aktuelle Clip bleiben stehen (auch wenn er fehlt),
+        # damit video_index und die Antwort weiter zum gesehenen Clip passen
+        keys, i = st.session_state.playlist, st.session_state.video_index
+        st.session_state.playlist = keys[:i + 1] + tuple(k for k in keys[i + 1:] if k in rows)
+        st.session_state.playlist_version = catalog.version
+    return [rows.get(k) for k in st.session_state.playlist]
 
 # ==========================================================
 # 🔢 NEUE ID LOGIK (Cloud-Safe)
 # ==========================================================
 def get_next_id_from_cloud(conn):
-    """Ermittelt die nächste ID basierend auf der Anzahl der Teilnehmer in der DB"""
-    try:
-        # ttl=0 ist wichtig, damit er wirklich die aktuellen Daten holt!
-        df = conn.read(worksheet="Tabellenblatt1", ttl=0)
-        
-        # Wenn Tabelle leer ist oder Spalte fehlt -> ID 1
-        if df.empty or "Testperson" not in df.columns:
-            return 1
-        
-        # Wir zählen, wie viele eindeutige Testpersonen es schon gibt
-        unique_ids = df["Testperson"].nunique()
-        return unique_ids + 1
-    except:
-        # Falls gar keine Verbindung klappt, Fallback auf 1
+    """Ermittelt die nächste ID: höchste Testpersonen-ID in der DB + 1"""
+    # Keine Verbindung -> Exception: der Aufrufer zählt dann lokal weiter und gleicht später ab
+    # (früher: Fallback auf 1, womit der lokale Zähler dauerhaft bei 0 anfing)
+    # ttl=0 ist wichtig, damit er wirklich die aktuellen Daten holt!
+    df = conn.read(worksheet="Tabellenblatt1", ttl=0)
+
+    # Wenn Tabelle leer ist oder Spalte fehlt -> ID 1
+    if df.empty or "Testperson" not in df.columns:
         return 1
 
+    # Höchste vergebene ID, nicht die Anzahl: IDs haben Lücken (Abbrecher, beim
+    # Neustart verworfene Blöcke), mit der Anzahl würden IDs doppelt vergeben
+    ids = pd.to_numeric(df["Testperson"], errors="coerce").dropna()
+    return int(ids.max()) + 1 if not ids.empty else 1
+
+def _cloud_last_id():
+    return get_next_id_from_cloud(_gsheets_connection()) - 1
+
+@st.cache_resource
+def _get_id_allocator():
+    """Ein Allocator pro Prozess; der Zähler wird beim ersten Mal aus der Cloud übernommen."""
+    if ID_BACKEND == "file":
+        backend = FileCounterBackend(os.path.join(DATA_FOLDER, "id_zaehler.txt"))
+    else:
+        backend = SqliteCounterBackend(os.path.join(DATA_FOLDER, "zuteilung.sqlite"))
+    if not backend.is_initialized() and CLOUD_BACKEND == "gsheets":
+        try:
+            backend.initialize(_get_sheets_uploader().breaker.call(_cloud_last_id))
+        except Exception:
+            # Offline: lokal weiterzählen, der Abgleich-Thread setzt den Zähler später hinter die Cloud
+            _get_outbox().mark_id_seed_pending()
+    return IdAllocator(backend, block_size=ID_BLOCK_SIZE)
+
+@st.cache_resource
+def _get_session_store():
+    """Geteilter Session-Zustand aller Prozesse – None bei STATE_BACKEND=none."""
+    return make_session_store(STATE_BACKEND, DATA_FOLDER)
+
+@st.cache_resource
+def _get_group_balancer():
+    return GroupBalancer(os.path.join(DATA_FOLDER, "zuteilung.sqlite"))
+
+# ==========================================================
+# 📈 METRIKEN & PROFILING
+# ==========================================================
+@st.cache_resource
+def _start_metrics():
+    """JSONL-Log (METRICS_JSONL=1) und /metrics-Endpoint (METRICS_PORT) einmal pro Prozess."""
+    if os.environ.get("METRICS_JSONL") == "1":
+        METRICS.enable_jsonl(os.path.join(DATA_FOLDER, "metrics.jsonl"))
+    port = os.environ.get("METRICS_PORT")
+    if not port: return None
+    # Port schon belegt (weiterer Prozess auf dem Rechner): dieser Prozess läuft ohne Endpoint
+    try: return start_metrics_server(int(port), host=os.environ.get("METRICS_HOST", "127.0.0.1"))
+    except OSError as e:
+        logger.warning("Metrik-Endpoint auf Port %s nicht gestartet: %s", port, e)
+        return None
+
+@st.cache_resource
+def _profiler_slot():
+    """Höchstens ein aktiver Profiler pro Prozess (cProfile ist ab Python 3.12 prozessweit)."""
+    return {"lock": threading.Lock(), "profiler": None, "owner": None, "session_id": None, "started": 0.0}
+
+def _dump_profile(profiler, session_id):
+    profiler.disable()
+    folder = os.path.join(DATA_FOLDER, "profile")
+    os.makedirs(folder, exist_ok=True)
+    profiler.dump_stats(os.path.join(folder, f"{session_id or 'start'}_{time.time():.0f}.prof"))
+
+def _profile_run():
+    """
+    Ein Script-Run lässt sich nicht sauber umschließen (st.stop/st.rerun), daher wird
+    das Profil des vorherigen Runs zu Beginn des nächsten Runs gespeichert. Ein
+    Profiler, dessen Tab geschlossen wurde, wird nach PROFILE_MAX_SECONDS von
+    einem beliebigen Run beendet, statt ewig alle Sessions mitzuprofilen.
+    """
+    slot = _profiler_slot()
+    owner = st.session_state.profile_owner
+    with slot["lock"]:
+        profiler = slot["profiler"]
+        if profiler is not None and (slot["owner"] == owner or time.time() - slot["started"] > PROFILE_MAX_SECONDS):
+            _dump_profile(profiler, slot["session_id"])
+            slot["profiler"] = None
+        if st.session_state.profiling and slot["profiler"] is None:
+            profiler = cProfile.Profile()
+            try: profiler.enable()
+            except ValueError: return
+            slot.update(profiler=profiler, owner=owner, session_id=st.session_state.session_id, started=time.time())
+
 # ==========================================================
 # Helpers: Query Params
 # ==========================================================
@@ -140,12 +428,44 @@ if 'group_name' not in st.session_state: st.session_state.group_name = None
 if 'video_index' not in st.session_state: st.session_state.video_index = 0
 if 'phase' not in st.session_state: st.session_state.phase = "viewing"
 if 'session_data' not in st.session_state: st.session_state.session_data = []
+if 'rehydrated_sid' not in st.session_state: st.session_state.rehydrated_sid = None
+if 'upload_final' not in st.session_state: st.session_state.upload_final = None
 if 'session_id' not in st.session_state: st.session_state.session_id = None
 if 'seed' not in st.session_state: st.session_state.seed = None
-if 'active_df' not in st.session_state: st.session_state.active_df = None
+if 'playlist' not in st.session_state: st.session_state.playlist = None
+if 'playlist_version' not in st.session_state: st.session_state.playlist_version = None
 if 'db_saved' not in st.session_state: st.session_state.db_saved = False
+if 'summary_saved' not in st.session_state: st.session_state.summary_saved = False
+if 'summary_future' not in st.session_state: st.session_state.summary_future = None
+if 'viewing_started' not in st.session_state: st.session_state.viewing_started = None
+if 'time_to_vote' not in st.session_state: st.session_state.time_to_vote = None
+if 'playback' not in st.session_state: st.session_state.playback = {}
+if 'play_time' not in st.session_state: st.session_state.play_time = None
+if 'profiling' not in st.session_state: st.session_state.profiling = False
+if 'profile_owner' not in st.session_state: st.session_state.profile_owner = uuid.uuid4().hex
+
+# --- Einmal pro Prozess: Metriken und Abgleich-Thread (holt die Outbox nach einem
+# Neustart nach, ohne auf den nächsten Teilnehmer auf der Ergebnisseite zu warten) ---
+_start_metrics()
+try: _get_background_sync()
+except Exception: logger.exception("Hintergrund-Abgleich konnte nicht gestartet werden")
+
+# --- Profiling pro Session (?profile=1 an, ?profile=0 aus; nur mit PROFILING_ENABLED=1) ---
+if PROFILING_ENABLED:
+    if qp.get("profile") is not None: st.session_state.profiling = qp.get("profile") == "1"
+    _profile_run()
 
 # --- Restore Logic ---
+# Fortschritt aus dem geteilten Session-Speicher (aktueller als die URL, inkl. Timer);
+# die URL reicht als Fallback, z.B. für Sessions von vor dem Umstieg.
+# Die Playlist (media_keys) gehört dazu: ein anderer Prozess hat evtl. einen neueren Katalog.
+PROGRESS_KEYS = ("user_name", "group_name", "video_index", "phase", "seed", "playlist", "viewing_started", "playback", "time_to_vote", "play_time", "db_saved", "summary_saved")
+
+def _load_shared_progress(sid):
+    store = _get_session_store()
+    try: return store.load_progress(sid) if store is not None and sid else None
+    except Exception: return None
+
 if st.session_state.user_name is None and qp.get("user") is not None:
     st.session_state.user_name = qp.get("user")
     st.session_state.group_name = qp.get("grp")
@@ -153,17 +473,17 @@ if st.session_state.user_name is None and qp.get("user") is not None:
     st.session_state.phase = qp.get("phase", "viewing")
     st.session_state.seed = _parse_int(qp.get("seed"), None)
     st.session_state.session_id = qp.get("sid")
-
-# --- RELOAD LOGIC (Scannt Ordner statt CSV) ---
-if st.session_state.user_name is not None and st.session_state.active_df is None and st.session_state.seed is not None:
+    shared = _load_shared_progress(st.session_state.session_id)
+    if shared and shared.get("user_name") == st.session_state.user_name:
+        for key in PROGRESS_KEYS:
+            if key in shared: st.session_state[key] = shared[key]
+        if st.session_state.playlist is not None: st.session_state.playlist = tuple(st.session_state.playlist)
+        st.session_state.shared_progress = shared
+
+# --- RELOAD LOGIC (Playlist aus Gruppe + Seed neu berechnen) ---
+if st.session_state.user_name is not None and st.session_state.playlist is None and st.session_state.seed is not None:
     try:
-        # HIER WIRD GESCANNT STATT GELESEN
-        full_df = scan_video_folders()
-        
-        if not full_df.empty and st.session_state.group_name:
-            filtered_df = full_df[full_df["gruppe"] == st.session_state.group_name]
-            real_anzahl = min(ANZAHL_VIDEOS, len(filtered_df))
-            st.session_state.active_df = filtered_df.sample(n=real_anzahl, random_state=st.session_state.seed).reset_index(drop=True)
+        if st.session_state.group_name: _current_playlist()
     except Exception as e:
         st.error(f"Fehler beim Scannen der Videos: {e}")
 
@@ -174,53 +494,103 @@ if st.session_state.user_name is not None:
 # ==========================================================
 # --- RESTORE SESSION DATA ---
 # ==========================================================
-def _rehydrate_session_data_from_csv():
-    file = os.path.join(DATA_FOLDER, "ergebnisse.csv")
-    if not os.path.isfile(file): return
-    try:
-        df_all = pd.read_csv(file, sep=';')
-    except: return
-    if "SessionID" not in df_all.columns: return
+def _rehydrate_session_data():
+    """
+    Lädt die bisherigen Antworten dieser Session (per SessionID-Index, nicht die ganze CSV).
+    Nur einmal pro SessionID: read_session leert den Puffer des Writers, das soll nicht
+    bei jedem Rerun bis zur ersten Antwort passieren.
+    """
     sid = st.session_state.session_id
     if not sid: return
-    df_sid = df_all[df_all["SessionID"] == sid].copy()
-    if df_sid.empty: return
-    if "Zeitstempel" in df_sid.columns:
-        try:
-            df_sid["_ts"] = pd.to_datetime(df_sid["Zeitstempel"], format="%d.%m.%Y %H:%M:%S", errors="coerce")
-            df_sid = df_sid.sort_values("_ts")
-        except: pass
-    st.session_state.session_data = df_sid.to_dict(orient="records")
-
-if st.session_state.user_name is not None and not st.session_state.session_data:
-    _rehydrate_session_data_from_csv()
+    try:
+        with METRICS.timed("rehydrate", sid):
+            # Geteilter Speicher zuerst: der Writer eines anderen Prozesses hat evtl. noch nicht geschrieben
+            store = _get_session_store()
+            rows = (store.answers(sid) if store is not None else None) or _get_result_writer().read_session(sid)
+    except Exception: return
+    st.session_state.rehydrated_sid = sid
+    if rows: st.session_state.session_data = [Answer.from_row(row) for row in rows]
+
+if (st.session_state.user_name is not None and not st.session_state.session_data
+        and st.session_state.rehydrated_sid != st.session_state.session_id):
+    _rehydrate_session_data()
 
 # ==========================================================
 # --- SPEICHERN ---
 # ==========================================================
 def save_result(video_name, wahl, korrektes_label):
-    file = os.path.join(DATA_FOLDER, 'ergebnisse.csv')
     wahl_mapped = "fake" if wahl == "Deepfake" else "real"
     erfolg_wert = 1 if wahl_mapped.lower() == korrektes_label.lower() else 0
 
-    daten_zeile = {
-        "Zeitstempel": datetime.now().strftime("%d.%m.%Y %H:%M:%S"),
-        "Testperson": st.session_state.user_name,
-        "Gruppe": st.session_state.group_name,
-        "SessionID": st.session_state.session_id,
-        "Video": video_name,
-        "Antwort_User": wahl,
-        "Korrektes_Label": korrektes_label,
-        "Erfolg": erfolg_wert,
-        "Wahl_Mapped": wahl_mapped
-    }
-    st.session_state.session_data.append(daten_zeile)
-    df_new = pd.DataFrame([daten_zeile])
-    
-    if not os.path.isfile(file):
-        df_new.to_csv(file, index=False, sep=';')
-    else:
-        df_new.to_csv(file, mode='a', index=False, sep=';', header=False)
+    antwort = Answer(
+        zeitstempel=time.time(),
+        video=sys.intern(video_name),
+        antwort_user=sys.intern(wahl),
+        korrektes_label=sys.intern(korrektes_label),
+        wahl_mapped=sys.intern(wahl_mapped),
+        erfolg=erfolg_wert,
+        zeit_bis_bewertung=st.session_state.time_to_vote,
+        abspieldauer=st.session_state.play_time,
+    )
+    # Im Session-State nur der kompakte Datensatz; die volle Zeile nur für den Writer
+    st.session_state.session_data.append(antwort)
+    daten_zeile = antwort.to_row(st.session_state.user_name, st.session_state.group_name, st.session_state.session_id)
+    # Nicht mehr direkt in die CSV: der Writer-Thread schreibt gesammelt (mit Datei-Lock)
+    with METRICS.timed("save_result", st.session_state.session_id):
+        _get_result_writer().submit(daten_zeile)
+        store = _get_session_store()
+        if store is not None:
+            try: store.add_answer(st.session_state.session_id, st.session_state.video_index, daten_zeile)
+            except Exception: pass
+
+@st.cache_resource
+def _pyplot():
+    """matplotlib erst für die Ergebnisseite laden (Agg: kein GUI-Backend auf dem Server)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def _figure_png(fig):
+    """PNG-Bytes einer Figure; die Figure wird danach geschlossen (sonst wächst der Speicher)."""
+    buf = io.BytesIO()
+    try: fig.savefig(buf, format="png", bbox_inches="tight")
+    finally: _pyplot().close(fig)
+    return buf.getvalue()
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES)
+def _render_result_figures(session_id, cm, fpr, tpr, roc_auc):
+    """
+    Konfusionsmatrix und ROC als PNG, gecacht pro SessionID (LRU über max_entries).
+    Reruns der Ergebnisseite rendern so nichts neu.
+    """
+    from sklearn.metrics import ConfusionMatrixDisplay
+    import numpy as np
+    plt = _pyplot()
+    with METRICS.timed("figures_render", session_id):
+        fig_cm, ax_cm = plt.subplots(figsize=(3.3, 3.0), dpi=150)
+        disp = ConfusionMatrixDisplay(confusion_matrix=np.array(cm), display_labels=["Echt", "Fake"])
+        disp.plot(ax=ax_cm, values_format="d", colorbar=False)
+        cm_png = _figure_png(fig_cm)
+
+        roc_png = None
+        if fpr is not None:
+            fig, ax = plt.subplots(figsize=(7.2, 4.6), dpi=150)
+            ax.plot(fpr, tpr, lw=2, label=f'AUC = {roc_auc:.2f}')
+            ax.plot([0, 1], [0, 1], lw=2, linestyle='--')
+            roc_png = _figure_png(fig)
+    return cm_png, roc_png
+
+@st.cache_resource
+def _get_summary_store():
+    return SummaryStore(os.path.join(DATA_FOLDER, "ergebnisse.sqlite"))
+
+def _log_summary_result(session_id):
+    """Done-Callback für den Upsert: Fehler landen im Log (der nächste Rerun versucht es erneut)."""
+    def callback(future):
+        if future.exception() is not None:
+            logger.error("Zusammenfassung für %s nicht gespeichert", session_id, exc_info=future.exception())
+    return callback
 
 # ==========================================================
 # --- CSS ---
@@ -247,6 +617,11 @@ results_css = """
 div[data-testid="stVerticalBlock"] { gap: 0.6rem; }
 </style>
 """
+prefetch_css = """
+<style>
+  .st-key-prefetch { display: none !important; }
+</style>
+"""
 start_css = """
 <style>
   .start-desc  { font-size: 20px; line-height: 1.6; max-width: 950px; }
@@ -263,6 +638,99 @@ def _sync_state_to_url():
     if st.session_state.user_name is None:
         _clear_qp(); return
     _set_qp(user=st.session_state.user_name, grp=st.session_state.group_name, i=st.session_state.video_index, phase=st.session_state.phase, seed=st.session_state.seed, sid=st.session_state.session_id)
+    _save_shared_progress()
+
+def _save_shared_progress():
+    """Fortschritt in den geteilten Speicher – nur wenn er sich seit dem letzten Mal geändert hat."""
+    store = _get_session_store()
+    if store is None: return
+    progress = {key: st.session_state.get(key) for key in PROGRESS_KEYS}
+    if progress == st.session_state.get("shared_progress"): return
+    try:
+        store.save_progress(st.session_state.session_id, progress)
+        st.session_state.shared_progress = progress
+    except Exception: pass
+
+# ==========================================================
+# ⏳ TIMER (nicht-blockierend)
+# ==========================================================
+def _track_playback(event):
+    """Neue Meldung der Wiedergabe-Komponente übernehmen (Empfangszeit nach Serveruhr)."""
+    pb = st.session_state.playback
+    if not event or event.get("seq") == pb.get("seq"): return
+    now = time.time()
+    playing = event.get("event") == "playing"
+    # Neues Dict statt Änderung in place: _save_shared_progress vergleicht mit dem letzten Stand
+    st.session_state.playback = dict(pb, seq=event.get("seq"), played=float(event.get("played") or 0), playing=playing, at=now)
+    if playing and pb.get("started") is None:
+        st.session_state.playback["started"] = now
+    _save_shared_progress()
+
+def _played_seconds():
+    """Im Browser tatsächlich abgespielte Sekunden – None, wenn die Komponente nichts gemeldet hat."""
+    pb = st.session_state.playback
+    if pb.get("seq") is None: return None
+    return pb["played"] + (time.time() - pb["at"] if pb["playing"] else 0)
+
+def _countdown_start():
+    """Ab hier zählt der Countdown: Wiedergabestart, ersatzweise Rendern + Wartezeit; None = noch warten."""
+    started = st.session_state.playback.get("started")
+    if started is not None: return started
+    fallback = st.session_state.viewing_started + PLAYBACK_WAIT_SECONDS
+    return fallback if time.time() >= fallback else None
+
+def _end_viewing():
+    """
+    Beendet die Viewing-Phase. Zeit_bis_Bewertung zählt serverseitig ab dem Rendern
+    (Ladezeit inklusive), Abspieldauer sind die im Browser wirklich abgespielten Sekunden.
+    """
+    if st.session_state.viewing_started is not None:
+        st.session_state.time_to_vote = round(time.time() - st.session_state.viewing_started, 2)
+    played = _played_seconds()
+    st.session_state.play_time = round(played, 2) if played is not None else None
+    st.session_state.viewing_started = None
+    st.session_state.playback = {}
+    st.session_state.phase = "voting"
+    _sync_state_to_url()
+
+@st.fragment(run_every=1)
+def _viewing_timer():
+    """
+    Countdown als Fragment: statt einen Script-Thread 20 s mit time.sleep zu
+    blockieren, läuft nur jede Sekunde dieses Fragment kurz neu. Er startet erst,
+    wenn das Video im Browser läuft – Ladezeit geht nicht vom Zeitlimit ab.
+    """
+    start = _countdown_start()
+    if start is None:
+        st.subheader("⏳ Video wird geladen …"); return
+    rest = SICHTDAUER_SEKUNDEN - (time.time() - start)
+    if rest <= 0:
+        _end_viewing(); st.rerun()
+    st.subheader(f"⏳ Noch {max(0, math.ceil(rest))} Sekunden")
+
+# ==========================================================
+# ☁️ UPLOAD-STATUS (Polling statt Warten)
+# ==========================================================
+def _show_upload_status(status, error=None):
+    if status == UPLOADED:
+        st.success("✅ Ergebnisse wurden erfolgreich in der Cloud-Datenbank gespeichert.")
+    elif status == DUPLICATE:
+        st.warning("⚠️ Daten für diese Session sind bereits in der Cloud! (Upload übersprungen)")
+    elif status in (PENDING, FAILED) and _get_background_sync().offline:
+        st.info("📴 Cloud gerade nicht erreichbar – deine Antworten sind lokal gespeichert und werden automatisch nachgereicht.")
+    elif status == FAILED:
+        st.warning(f"⚠️ Cloud-Upload fehlgeschlagen ({error}) – wird im Hintergrund erneut versucht.")
+    elif status == PENDING:
+        st.info("⏳ Ergebnisse werden im Hintergrund in die Cloud übertragen …")
+
+@st.fragment(run_every=2)
+def _upload_status():
+    """Fragt den Upload-Status ab, bis er endgültig ist – danach ein Rerun ohne Polling."""
+    status, error = _get_background_sync().status(st.session_state.session_id)
+    if status in (UPLOADED, DUPLICATE):
+        st.session_state.upload_final = status
+        st.rerun()
+    _show_upload_status(status, error)
 
 # ==========================================================
 # 1. STARTSCREEN
@@ -281,26 +749,24 @@ def render_start():
     st.markdown('<div class="start-info">', unsafe_allow_html=True)
     st.info(f"""
 **Deine Aufgabe:** Entscheide nach jedem Clip, ob das Video **echt** oder ein **Deepfake** ist.
-⏱️ **Zeitlimit:** Du hast pro Video **20 Sekunden**.
+⏱️ **Zeitlimit:** Du hast pro Video **{SICHTDAUER_SEKUNDEN} Sekunden**.
 ℹ️ **Umfang:** Es werden **{ANZAHL_VIDEOS} Videos** gezeigt.
 """)
     st.markdown('</div>', unsafe_allow_html=True)
     st.markdown("<br>", unsafe_allow_html=True)
 
     if st.button("Studie starten", key="__start_btn", type="primary"):
-        # 1. Verbindung herstellen und ID aus der Cloud holen
-        try:
-            conn = st.connection("gsheets", type=GSheetsConnection)
-            new_id = get_next_id_from_cloud(conn)
-        except Exception as e:
-            # Notfall-Fallback, falls Internet weg ist
-            new_id = 999 
-        
+        # 1. ID atomar vergeben (Block-Reservierung statt Cloud-Abfrage pro Start)
+        with METRICS.timed("id_allocation"):
+            new_id = _get_id_allocator().next_id()
         st.session_state.user_name = str(new_id)
-        
-        # 2. Gruppe berechnen
-        gruppen_rest = new_id % 3
-        zugewiesene_gruppe = GRUPPEN_MAPPING[gruppen_rest]
+        st.session_state.session_id = uuid.uuid4().hex
+        # Noch kein Abgleich mit der Cloud -> ID in der Outbox vormerken
+        if CLOUD_BACKEND == "gsheets" and _get_outbox().id_seed_pending():
+            _get_outbox().record_id(new_id, st.session_state.session_id)
+
+        # 2. Gruppe zuteilen (wenigste abgeschlossene Sessions; Gleichstand -> ID % 3)
+        zugewiesene_gruppe = _get_group_balancer().assign(st.session_state.session_id, GRUPPEN_MAPPING, preferred=new_id % 3)
         st.session_state.group_name = zugewiesene_gruppe
 
         # 3. Session Init
@@ -308,8 +774,9 @@ def render_start():
         st.session_state.phase = "viewing"
         st.session_state.session_data = []
         st.session_state.seed = int(time.time())
-        st.session_state.session_id = uuid.uuid4().hex
         st.session_state.db_saved = False
+        st.session_state.summary_saved = False
+        st.session_state.summary_future = None
 
         # 4. VIDEOS SCANNEN STATT CSV LADEN
         try:
@@ -319,19 +786,12 @@ def render_start():
                 st.error("Fehler: Keine Videos gefunden! Bitte Ordnerstruktur prüfen.")
                 st.stop()
             
-            # Filtern nach Gruppe
-            filtered_df = full_df[full_df["gruppe"] == zugewiesene_gruppe]
-            
-            if len(filtered_df) == 0:
+            # Stratifizierte Playlist (nur media_keys + Seed im Session-State)
+            st.session_state.playlist = None
+            if len(_current_playlist()) == 0:
                 st.error(f"Fehler: Keine Videos für Gruppe '{zugewiesene_gruppe}' gefunden. Ordnernamen prüfen!")
                 st.stop()
 
-            real_anzahl = min(ANZAHL_VIDEOS, len(filtered_df))
-            st.session_state.active_df = filtered_df.sample(
-                n=real_anzahl, 
-                random_state=st.session_state.seed
-            ).reset_index(drop=True)
-
             _sync_state_to_url()
             start_slot.empty()
             st.rerun()
@@ -349,48 +809,54 @@ else:
 # ==========================================================
 # HAUPT-LOGIK
 # ==========================================================
-if st.session_state.active_df is None:
+if st.session_state.playlist is None:
     st.error("Fehler: Videoliste nicht geladen. Bitte Seite neu laden (F5).")
     st.stop()
 
-df = st.session_state.active_df
+playlist = _current_playlist()
+df = scan_video_folders()
 
-if st.session_state.video_index < len(df):
-    video_info = df.iloc[st.session_state.video_index]
-    # WICHTIG: Hier nutzen wir den relativen Pfad aus dem Scan
-    video_path = os.path.join(VIDEO_ROOT, video_info['full_path'])
+if st.session_state.video_index < len(playlist):
+    row = playlist[st.session_state.video_index]
+    video_info = df.iloc[row] if row is not None else _missing_clip(st.session_state.playlist[st.session_state.video_index])
 
     content_placeholder = st.empty()
     footer_placeholder = st.empty()
 
     if st.session_state.phase == "viewing":
+        if st.session_state.viewing_started is None:
+            st.session_state.viewing_started = time.time()
+            st.session_state.playback = {}
+            _save_shared_progress()  # Timer läuft in jedem Prozess weiter, statt neu zu starten
         footer_placeholder.empty()
         with content_placeholder.container():
             st.markdown(viewing_css, unsafe_allow_html=True)
             col_titel, col_hinweis = st.columns([1, 1])
             with col_titel:
-                st.title(f"Video {st.session_state.video_index + 1} von {len(df)}")
+                st.title(f"Video {st.session_state.video_index + 1} von {len(playlist)}")
                 # st.caption(f"Teilnehmer ID: {st.session_state.user_name} | Gruppe: {st.session_state.group_name}")
             with col_hinweis:
                 st.markdown("<div style='padding-top: 25px;'></div>", unsafe_allow_html=True)
-                st.info("Das Video verschwindet automatisch nach 20 Sekunden.")
+                st.info(f"Das Video verschwindet automatisch nach {SICHTDAUER_SEKUNDEN} Sekunden.")
+
+            if row is None:
+                # Clip wurde während der Session entfernt: überspringen, ohne Antwort
+                st.warning("Dieses Video ist nicht mehr verfügbar.")
+                if st.button("Weiter zum nächsten Video", width="stretch"):
+                    st.session_state.viewing_started = None
+                    st.session_state.video_index += 1
+                    _sync_state_to_url(); st.rerun()
+                st.stop()
 
-            if os.path.exists(video_path):
-                st.video(video_path)
-            else:
-                st.error(f"Video nicht gefunden: {video_path}")
+            show_video(video_info)
+            _track_playback(playback_event(key=f"playback_{st.session_state.video_index}"))
 
             col_links, col_rechts = st.columns([1, 1])
-            with col_links: timer_anzeige = st.empty()
+            with col_links: _viewing_timer()
             with col_rechts:
                 st.markdown("<div style='padding-top: 0px;'></div>", unsafe_allow_html=True)
-                if st.button("Video fertig geschaut - zur Bewertung", use_container_width=True):
-                    st.session_state.phase = "voting"; _sync_state_to_url(); st.rerun()
-
-            for sekunde in range(20, -1, -1):
-                timer_anzeige.subheader(f"⏳ Noch {sekunde} Sekunden")
-                time.sleep(1)
-            st.session_state.phase = "voting"; _sync_state_to_url(); st.rerun()
+                if st.button("Video fertig geschaut - zur Bewertung", width="stretch"):
+                    _end_viewing(); st.rerun()
 
     elif st.session_state.phase == "voting":
         with content_placeholder.container():
@@ -400,14 +866,20 @@ if st.session_state.video_index < len(df):
         if wahl:
             with footer_placeholder.container():
                 st.markdown("<br>", unsafe_allow_html=True)
-                if st.button("Nächstes Video →", use_container_width=True):
+                if st.button("Nächstes Video →", width="stretch"):
                     save_result(video_info['filename'], wahl, video_info['label'])
+                    st.session_state.time_to_vote = None
+                    st.session_state.play_time = None
                     st.session_state.video_index += 1
                     st.session_state.phase = "viewing"
                     _sync_state_to_url()
                     footer_placeholder.empty()
                     st.rerun()
 
+        # Nächsten Clip schon laden, solange bewertet wird
+        if st.session_state.video_index + 1 < len(playlist) and playlist[st.session_state.video_index + 1] is not None:
+            prefetch_video(df.iloc[playlist[st.session_state.video_index + 1]])
+
 # ==========================================================
 # AUSWERTUNG
 # ==========================================================
@@ -422,7 +894,8 @@ else:
     st.markdown("<div style='padding-top: 25px;'></div>", unsafe_allow_html=True)
     st.title("Vielen Dank für deine Teilnahme!")
 
-    results_df = pd.DataFrame(st.session_state.session_data)
+    # DataFrame nur hier, für die Metriken
+    results_df = answers_frame(st.session_state.session_data, st.session_state.user_name, st.session_state.group_name, st.session_state.session_id)
     if results_df.empty:
         st.warning("Keine Ergebnisse vorhanden.")
         if st.button("Zurück zum Start"):
@@ -435,14 +908,17 @@ else:
     if y_true.isnull().any() or y_pred.isnull().any():
          st.error("Fehler bei der Datenauswertung (Label-Mismatch)."); st.stop()
 
-    acc = accuracy_score(y_true, y_pred)
-    roc_auc = None
-    fpr, tpr = None, None
-    if y_true.nunique() == 2:
-        fpr, tpr, _ = roc_curve(y_true, y_pred)
-        roc_auc = auc(fpr, tpr)
-
-    cm = confusion_matrix(y_true, y_pred, labels=[0, 1])
+    with METRICS.timed("metrics_sklearn", st.session_state.session_id):
+        # Erst hier: sklearn kostet beim Import deutlich mehr als der Rest der App
+        from sklearn.metrics import accuracy_score, roc_curve, auc, confusion_matrix
+        acc = accuracy_score(y_true, y_pred)
+        roc_auc = None
+        fpr, tpr = None, None
+        if y_true.nunique() == 2:
+            fpr, tpr, _ = roc_curve(y_true, y_pred)
+            roc_auc = auc(fpr, tpr)
+
+        cm = confusion_matrix(y_true, y_pred, labels=[0, 1])
     left, right = st.columns([0.8, 1.25], gap="large")
 
     with left:
@@ -451,53 +927,62 @@ else:
         if acc_percent >= 70: st.success(f"✅ Genauigkeit: {acc_percent:.1f}%")
         elif acc_percent >= 60: st.warning(f"🟠 Genauigkeit: {acc_percent:.1f}%")
         else: st.error(f"🔴 Genauigkeit: {acc_percent:.1f}%")
-        fig_cm, ax_cm = plt.subplots(figsize=(3.3, 3.0), dpi=150)
-        disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=["Echt", "Fake"])
-        disp.plot(ax=ax_cm, values_format="d", colorbar=False)
-        st.pyplot(fig_cm)
+        cm_png, roc_png = _render_result_figures(
+            st.session_state.session_id,
+            tuple(map(tuple, cm.tolist())),
+            tuple(fpr.tolist()) if fpr is not None else None,
+            tuple(tpr.tolist()) if tpr is not None else None,
+            roc_auc,
+        )
+        st.image(cm_png, width="stretch")
 
     with right:
         st.subheader("ROC")
-        if fpr is not None:
-            fig, ax = plt.subplots(figsize=(7.2, 4.6), dpi=150)
-            ax.plot(fpr, tpr, lw=2, label=f'AUC = {roc_auc:.2f}')
-            ax.plot([0, 1], [0, 1], lw=2, linestyle='--')
-            st.pyplot(fig)
+        if roc_png is not None: st.image(roc_png, width="stretch")
         else: st.info("ROC benötigt beide Klassen.")
 
-# ☁️ GOOGLE SHEETS UPLOAD (MIT DUPLIKAT-CHECK)
+# ☁️ GOOGLE SHEETS UPLOAD (IM HINTERGRUND, IDEMPOTENT PRO SESSION)
     if not st.session_state.db_saved:
+        # Zeiten dieser Session (Summe je Phase) als eine Zeile ins Metrik-Log
+        METRICS.end_session(st.session_state.session_id)
         try:
-            conn = st.connection("gsheets", type=GSheetsConnection)
-            # 1. Daten lesen (frisch, ohne Cache!)
-            existing_data = conn.read(worksheet="Tabellenblatt1", ttl=0)
-            
-            # 2. Prüfen, ob SessionID schon existiert
-            current_sid = st.session_state.session_id
-            
-            if not existing_data.empty and "SessionID" in existing_data.columns and current_sid in existing_data["SessionID"].values:
-                # Fall A: Schon da -> Nix machen
-                st.warning("⚠️ Daten für diese Session sind bereits in der Cloud! (Upload übersprungen)")
-                st.session_state.db_saved = True
-            else:
-                # Fall B: Neu -> Uploaden
-                if existing_data.empty: 
-                    updated_data = results_df
-                else: 
-                    updated_data = pd.concat([existing_data, results_df], ignore_index=True)
-                
-                conn.update(worksheet="Tabellenblatt1", data=updated_data)
-                st.session_state.db_saved = True
-                st.success("✅ Ergebnisse wurden erfolgreich in der Cloud-Datenbank gespeichert.")
-                
+            # Abgeschlossene Session zählt für die Gruppen-Balance (idempotent)
+            _get_group_balancer().complete(st.session_state.session_id, st.session_state.group_name)
+        except Exception: pass
+        try:
+            # Nur in die persistente Job-Liste legen – der Upload läuft im Hintergrund
+            rows = answers_to_rows(st.session_state.session_data, st.session_state.user_name, st.session_state.group_name, st.session_state.session_id)
+            _get_background_sync().submit_upload(st.session_state.session_id, rows)
+            st.session_state.db_saved = True
+            _save_shared_progress()
         except Exception as e:
             st.error(f"Fehler beim Cloud-Upload: {e}")
-
-    # Forscher-Zusammenfassung
-    summary_file = os.path.join(DATA_FOLDER, f"summary_{st.session_state.user_name}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv")
-    summary_data = pd.DataFrame([{"ID": st.session_state.user_name, "Gruppe": st.session_state.group_name, "Accuracy": acc, "AUC": (roc_auc if roc_auc is not None else "")}])
-    summary_data.to_csv(summary_file, index=False, sep=';')
+    if st.session_state.db_saved:
+        if st.session_state.upload_final is None: _upload_status()
+        else: _show_upload_status(st.session_state.upload_final)
+
+    # Forscher-Zusammenfassung: Upsert per SessionID (im Hintergrund). summary_saved erst,
+    # wenn der Upsert wirklich durch ist – sonst beim nächsten Rerun noch einmal.
+    future = st.session_state.summary_future
+    if future is not None and future.done():
+        st.session_state.summary_future = None
+        if future.exception() is None:
+            st.session_state.summary_saved = True
+            _save_shared_progress()
+    if not st.session_state.summary_saved and st.session_state.summary_future is None:
+        summary_row = {
+            "SessionID": st.session_state.session_id,
+            "ID": st.session_state.user_name,
+            "Gruppe": st.session_state.group_name,
+            "Accuracy": float(acc),
+            "AUC": (float(roc_auc) if roc_auc is not None else None),
+            "Antworten": len(results_df),
+            "Zeitstempel": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        future = _get_background_sync().submit_task(_get_summary_store().upsert, summary_row)
+        future.add_done_callback(_log_summary_result(st.session_state.session_id))
+        st.session_state.summary_future = future
     
     st.markdown("<br>", unsafe_allow_html=True)
-    if st.button("Nächster Teilnehmer (Neue ID)", use_container_width=True):
+    if st.button("Nächster Teilnehmer (Neue ID)", width="stretch"):
         st.session_state.clear(); _clear_qp(); st.rerun()
\ No newline at end of file
@@ -0,0 +1,373 @@
+"""
+Lasttest für den Studienablauf (headless, ohne Browser).
+
+    python benchmark.py --participants 20 --videos 10
+    python benchmark.py --participants 50 --videos 60 --out bench.json
+
+Simuliert N gleichzeitige Teilnehmer (ein Prozess + eine AppTest-Session pro
+Person, alle starten zum selben Zeitpunkt auf demselben STUDY_DATA_DIR):
+Start -> pro Video (Viewing -> Voting -> Nächstes Video) -> Ergebnisseite.
+Eigene Prozesse statt Threads, weil AppTest pro Script-Run eine prozessweite
+Runtime setzt und wieder abräumt. Das entspricht N App-Prozessen auf einem
+Rechner: ID-Zähler, Gruppen-Balance, Outbox und Ergebnis-Dateien werden
+wirklich gleichzeitig benutzt. Am Ende wird geprüft, ob jede Antwort genau
+einmal gespeichert wurde und jede ID nur einmal vergeben ist.
+
+Der Schreib-Test (--writers) geht denselben Weg wie save_result(): Answer ->
+BufferedResultWriter -> RESULT_SINK (Standard csv,sqlite), ein Writer pro Prozess.
+Cloud-Zugriffe laufen gegen die lokale Ersatz-Tabelle (CLOUD_BACKEND=local),
+alle Daten landen in einem temporären Ordner. Das Ergebnis ist JSON, damit
+Regressionen über die Zeit verglichen werden können.
+
+    python benchmark.py --startup --reruns 20
+
+misst stattdessen den Kaltstart (erster Script-Run in einem frischen Prozess)
+und die Dauer einzelner Reruns in der Viewing-Phase, inkl. der Frage, ob
+sklearn/matplotlib dabei schon geladen wurden. Messwerte vorher/nachher stehen
+in benchmark_startup.md.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+# Module, die nur die Ergebnisseite bzw. der Cloud-Zugriff brauchen
+HEAVY_MODULES = ("sklearn", "matplotlib", "streamlit_gsheets")
+# Wie in app.py: so schreibt save_result() über _get_result_writer()
+RESULT_SINK = os.environ.get("RESULT_SINK", "csv,sqlite")
+RESULT_FSYNC = os.environ.get("RESULT_FSYNC", "always")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(values):
+    return {
+        "n": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2) if values else None,
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2) if values else None,
+        "max_ms": round(max(values) * 1000, 2) if values else None,
+        "mean_ms": round(statistics.fmean(values) * 1000, 2) if values else None,
+    }
+
+
+def rss_mb():
+    """Aktueller RSS des Prozesses (Linux: /proc, sonst Peak über resource)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+class Sampler(threading.Thread):
+    """Misst RSS und Thread-Anzahl in festen Abständen."""
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            self.samples.append({"t": time.time(), "rss_mb": rss_mb(), "threads": threading.active_count()})
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def _button(at, label):
+    for button in at.button:
+        if button.label.startswith(label):
+            return button
+    raise AssertionError(f"Button '{label}' nicht gefunden (Phase {at.session_state['phase']})")
+
+
+def _wait_until(start_at):
+    delay = start_at - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def run_participant(timeout, start_at):
+    """Läuft im eigenen Prozess: eine Session von Start bis Ergebnisseite."""
+    from streamlit.testing.v1 import AppTest
+
+    timings, errors = {}, []
+    sampler = Sampler()
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    _wait_until(start_at)
+    sampler.start()
+
+    def step(name, fn):
+        t0 = time.perf_counter()
+        fn()
+        timings.setdefault(name, []).append(time.perf_counter() - t0)
+        if at.exception:
+            raise AssertionError(f"{name}: {at.exception[0].message}")
+
+    try:
+        step("erster_aufruf", at.run)
+        step("start", lambda: at.button(key="__start_btn").click().run())
+        n = len(at.session_state["playlist"])
+        for i in range(n):
+            step("viewing_zu_voting", lambda: _button(at, "Video fertig geschaut").click().run())
+            step("auswahl", lambda: at.radio(key=f"entscheidung_{i}").set_value("Echt").run())
+            step("voting_zu_naechstem", lambda: _button(at, "Nächstes Video").click().run())
+        step("ergebnis_rerun", at.run)
+    except Exception as e:
+        errors.append(repr(e))
+    sampler.stop()
+    return {
+        "timings": timings,
+        "fehler": errors,
+        "testperson": at.session_state["user_name"] if "user_name" in at.session_state else None,
+        "rss_mb_max": max((x["rss_mb"] or 0 for x in sampler.samples), default=None),
+        "threads_max": max((x["threads"] for x in sampler.samples), default=None),
+    }
+
+
+def _run_children(mode, count, extra_args):
+    """Startet count Kindprozesse (--<mode>-child) und sammelt ihre JSON-Zeilen ein."""
+    start_at = time.time() + 5.0  # genug Zeit für Import + AppTest-Setup in allen Prozessen
+    procs = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), f"--{mode}-child", "--start-at", str(start_at)] + extra_args,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        for _ in range(count)
+    ]
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        try:
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        except (IndexError, ValueError):
+            results.append({"fehler": [f"Kindprozess ohne Ergebnis (Exit-Code {proc.returncode})"]})
+    return results, time.time() - start_at
+
+
+def check_results(data_folder, participants, videos):
+    """Jede Antwort genau einmal in CSV und SQLite, jede Testpersonen-ID nur einmal."""
+    import sqlite3
+    import pandas as pd
+    from result_store import CSV_SEP
+
+    csv_df = pd.read_csv(os.path.join(data_folder, "ergebnisse.csv"), sep=CSV_SEP, dtype=str)
+    with sqlite3.connect(os.path.join(data_folder, "ergebnisse.sqlite")) as conn:
+        sqlite_rows = conn.execute("SELECT COUNT(*) FROM ergebnisse").fetchone()[0]
+    ids_per_session = csv_df.groupby("SessionID")["Testperson"].nunique()
+    sessions_per_id = csv_df.groupby("Testperson")["SessionID"].nunique()
+    return {
+        "erwartet": participants * videos,
+        "csv_zeilen": len(csv_df),
+        "sqlite_zeilen": sqlite_rows,
+        "doppelte_zeilen": int(csv_df.duplicated(["SessionID", "Video"]).sum()),
+        "ids_mehrfach_vergeben": int((sessions_per_id > 1).sum()),
+        "sessions_mit_mehreren_ids": int((ids_per_session > 1).sum()),
+    }
+
+
+def _loaded_heavy_modules():
+    return sorted(m for m in HEAVY_MODULES if m in sys.modules)
+
+
+def startup_child(reruns, timeout):
+    """Läuft im frischen Prozess: Import, erster Run, Start, Reruns der Viewing-Phase."""
+    t0 = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    import_s = time.perf_counter() - t0
+
+    at = AppTest.from_file(APP_FILE, default_timeout=timeout)
+    t0 = time.perf_counter()
+    at.run()
+    first_run_s = time.perf_counter() - t0
+    after_first = _loaded_heavy_modules()
+
+    at.button(key="__start_btn").click().run()
+    rerun_times = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - t0)
+    return {
+        "streamlit_import_ms": round(import_s * 1000, 2),
+        "erster_run_ms": round(first_run_s * 1000, 2),
+        "viewing_rerun": summarize(rerun_times),
+        "geladen_nach_erstem_run": after_first,
+        "geladen_nach_viewing": _loaded_heavy_modules(),
+        "fehler": [e.message for e in at.exception],
+    }
+
+
+def startup_baseline(reruns, timeout):
+    """Kaltstart im eigenen Prozess, damit bereits importierte Module nichts verfälschen."""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--startup-child", "--reruns", str(reruns), "--timeout", str(timeout)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def writer_child(data_folder, rows, start_at):
+    """
+    Ein App-Prozess, der nur speichert: pro Antwort dasselbe wie save_result()
+    (Answer.to_row -> BufferedResultWriter.submit), am Ende close() = letzter Flush.
+    """
+    import uuid
+    from result_store import BufferedResultWriter, make_result_sink
+    from session_records import Answer
+
+    writer = BufferedResultWriter(make_result_sink(RESULT_SINK, data_folder, fsync=RESULT_FSYNC))
+    session_id = uuid.uuid4().hex
+    _wait_until(start_at)
+    latencies = []
+    t0 = time.perf_counter()
+    for i in range(rows):
+        answer = Answer(zeitstempel=time.time(), video=f"clip{i}.mp4", antwort_user="Echt",
+                        korrektes_label="real", wahl_mapped="real", erfolg=1, zeit_bis_bewertung=1.0)
+        t1 = time.perf_counter()
+        writer.submit(answer.to_row(str(os.getpid()), "bench", session_id))
+        latencies.append(time.perf_counter() - t1)
+    t1 = time.perf_counter()
+    writer.close()
+    return {"submit_s": latencies, "flush_s": time.perf_counter() - t1, "gesamt_s": time.perf_counter() - t0}
+
+
+def write_contention(data_folder, writers, rows_per_writer):
+    """writers App-Prozesse speichern gleichzeitig über den gepufferten Writer in dieselben Dateien."""
+    import sqlite3
+
+    folder = os.path.join(data_folder, "contention")
+    os.makedirs(folder, exist_ok=True)
+    results, _ = _run_children("writer", writers, ["--rows", str(rows_per_writer), "--data-dir", folder])
+    latencies = [x for r in results for x in r.get("submit_s", [])]
+    expected = writers * rows_per_writer
+    with open(os.path.join(folder, "ergebnisse.csv"), encoding="utf-8") as f:
+        csv_rows = sum(1 for _ in f) - 1
+    with sqlite3.connect(os.path.join(folder, "ergebnisse.sqlite")) as conn:
+        sqlite_rows = conn.execute("SELECT COUNT(*) FROM ergebnisse").fetchone()[0]
+    slowest = max((r.get("gesamt_s", 0) for r in results), default=0)
+    return dict(
+        summarize(latencies),
+        sink=RESULT_SINK, fsync=RESULT_FSYNC, writers=writers,
+        flush_max_ms=round(max((r.get("flush_s", 0) for r in results), default=0) * 1000, 2),
+        rows_per_s=round(expected / slowest, 1) if slowest else None,
+        lost_rows_csv=expected - csv_rows, lost_rows_sqlite=expected - sqlite_rows,
+        fehler=[e for r in results for e in r.get("fehler", [])],
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lasttest für die Deepfake-Studie")
+    parser.add_argument("--participants", type=int, default=10)
+    parser.add_argument("--videos", type=int, default=10, help="Videos pro Teilnehmer (Studie: 60)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout pro Script-Run (s)")
+    parser.add_argument("--writers", type=int, default=8, help="Prozesse für den Schreib-Test")
+    parser.add_argument("--rows", type=int, default=50, help="Antworten pro Prozess im Schreib-Test")
+    parser.add_argument("--out", help="JSON-Datei für die Ergebnisse (sonst stdout)")
+    parser.add_argument("--startup", action="store_true", help="nur Kaltstart und Reruns messen")
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns der Viewing-Phase für --startup")
+    parser.add_argument("--startup-child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--participant-child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--writer-child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0.0, help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # Kindprozesse arbeiten im Datenordner des Elternprozesses
+    data_folder = args.data_dir or tempfile.mkdtemp(prefix="studie_bench_")
+    os.environ.update({
+        "CLOUD_BACKEND": "local",
+        "STUDY_DATA_DIR": data_folder,
+        "ANZAHL_VIDEOS": str(args.videos),
+    })
+    # Relativer videos-Ordner in app.py -> aus dem Projektordner starten
+    os.chdir(os.path.dirname(APP_FILE))
+
+    if args.startup_child:
+        print(json.dumps(startup_child(args.reruns, args.timeout)))
+        return
+    if args.participant_child:
+        print(json.dumps(run_participant(args.timeout, args.start_at)))
+        return
+    if args.writer_child:
+        print(json.dumps(writer_child(data_folder, args.rows, args.start_at)))
+        return
+    if args.startup:
+        report = dict(startup_baseline(args.reruns, args.timeout),
+                      zeitpunkt=datetime.now().isoformat(timespec="seconds"),
+                      python=platform.python_version(), daten_ordner=data_folder)
+        _write_report(report, args.out)
+        sys.exit(1 if report["fehler"] else 0)
+
+    child_args = ["--timeout", str(args.timeout), "--videos", str(args.videos), "--data-dir", data_folder]
+    results, wall = _run_children("participant", args.participants, child_args)
+    timings = {}
+    for r in results:
+        for name, values in r.get("timings", {}).items():
+            timings.setdefault(name, []).extend(values)
+    errors = [e for r in results for e in r.get("fehler", [])]
+    # Writer-Puffer sind mit dem Ende der Kindprozesse geleert (atexit -> close)
+    try:
+        storage = check_results(data_folder, args.participants, args.videos)
+    except Exception as e:
+        storage = {"fehler": repr(e)}
+    ok = (storage.get("csv_zeilen") == storage.get("sqlite_zeilen") == storage.get("erwartet")
+          and not storage.get("doppelte_zeilen") and not storage.get("ids_mehrfach_vergeben"))
+    if not errors and not ok:
+        errors.append(f"Antworten fehlen, sind doppelt oder IDs mehrfach vergeben: {storage}")
+
+    report = {
+        "zeitpunkt": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "teilnehmer": args.participants,
+        "videos": args.videos,
+        "dauer_s": round(wall, 2),
+        "fehler": errors,
+        "phasen": {name: summarize(values) for name, values in timings.items()},
+        "speicher": storage,
+        "rss_mb_max_pro_prozess": max((r.get("rss_mb_max") or 0 for r in results), default=None),
+        "threads_max_pro_prozess": max((r.get("threads_max") or 0 for r in results), default=None),
+        "schreib_test": write_contention(data_folder, args.writers, args.rows),
+        "daten_ordner": data_folder,
+    }
+    _write_report(report, args.out)
+    sys.exit(1 if errors else 0)
+
+
+def _write_report(report, out):
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
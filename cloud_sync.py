@@ -0,0 +1,623 @@
+import csv
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import METRICS
+
+# ==========================================================
+# ☁️ CLOUD-SYNC (Google Sheets: nur anhängen, nie komplett neu schreiben)
+# ==========================================================
+WORKSHEET = "Tabellenblatt1"
+SESSION_COLUMN = "SessionID"
+
+# Ergebnis von upload_session()
+UPLOADED = "uploaded"
+DUPLICATE = "duplicate"
+
+logger = logging.getLogger(__name__)
+
+
+class CloudUnavailable(ConnectionError):
+    """Der Circuit-Breaker ist offen: die Cloud wird gerade gar nicht erst angefragt."""
+
+
+class CircuitBreaker:
+    """
+    Merkt sich, dass die Cloud ausgefallen ist. Nach failure_threshold Fehlern in
+    Folge ist er offen und lehnt Aufrufe sofort ab (CloudUnavailable, kein Netz).
+    Nach reset_timeout darf genau ein Probe-Aufruf durch: klappt er, ist der
+    Breaker wieder geschlossen, sonst bleibt er für die nächste Wartezeit offen.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _update(self):
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            self._update()
+            return self._state
+
+    def is_open(self):
+        """True, solange die Cloud als ausgefallen gilt (Wartezeit läuft noch)."""
+        return self.state == self.OPEN
+
+    def allow(self):
+        with self._lock:
+            self._update()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Cloud wieder erreichbar")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Cloud nicht erreichbar – Aufrufe werden %.0f s lang übersprungen", self.reset_timeout)
+                    METRICS.count("cloud_breaker_open")
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+                self._probing = False
+
+    def call(self, fn):
+        if not self.allow():
+            raise CloudUnavailable("Cloud derzeit nicht erreichbar (Circuit-Breaker offen)")
+        try:
+            result = fn()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+def with_retry(fn, attempts=4, base_delay=0.5, max_delay=8.0, sleep=time.sleep):
+    """Ruft fn() auf und wiederholt bei Fehlern mit exponentiellem Backoff (+ Jitter)."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except CloudUnavailable:
+            # Breaker offen: Warten lohnt sich nicht, der Job bleibt in der Outbox
+            raise
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            METRICS.count("cloud_retries")
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            logger.warning("Cloud-Aufruf fehlgeschlagen, neuer Versuch in %.1f s", delay, exc_info=True)
+            sleep(delay * random.uniform(0.5, 1.0))
+
+
+def _cell(value):
+    return "" if value is None else value
+
+
+class SheetBackend:
+    """Minimale Schnittstelle zur Tabelle – echte Google-Tabelle oder lokaler Ersatz."""
+
+    def session_exists(self, worksheet, session_id):
+        return session_id in self.existing_sessions(worksheet, [session_id])
+
+    def existing_sessions(self, worksheet, session_ids):
+        """Teilmenge von session_ids, die schon im Tabellenblatt stehen (ein Lesezugriff)."""
+        raise NotImplementedError
+
+    def append_rows(self, worksheet, rows):
+        """Hängt rows (Liste von Dicts) ans Tabellenblatt an; Spalten werden per Header zugeordnet."""
+        raise NotImplementedError
+
+
+class GSheetsBackend(SheetBackend):
+    """
+    Adapter für st.connection("gsheets", type=GSheetsConnection).
+
+    Mit Service-Account wird direkt über gspread angehängt (append_rows: ein
+    Request, unabhängig von der Tabellengröße). Nur wenn dieser Weg nicht
+    verfügbar ist, wird auf das alte read/concat/update zurückgegriffen (mit
+    Warnung im Log: dabei wird jedes Mal das ganze Blatt gelesen und geschrieben).
+    Werte gehen RAW in die Tabelle, damit Sheets nichts in Datum/Zahl/Formel umdeutet.
+
+    Statt einer fertigen Verbindung kann connect (ohne Argumente) übergeben
+    werden; die Verbindung wird dann erst beim ersten Zugriff aufgebaut, damit
+    ein Ausfall beim Start nicht die ganze App blockiert.
+    """
+
+    def __init__(self, conn=None, connect=None):
+        self._conn = conn
+        self._connect = connect
+        self._header_lock = threading.Lock()
+        self._warned_legacy = False
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _worksheet(self, worksheet):
+        client = getattr(self.conn, "client", None) or getattr(self.conn, "_instance", None)
+        open_spreadsheet = getattr(client, "_open_spreadsheet", None)
+        if open_spreadsheet is None:
+            if not self._warned_legacy:
+                self._warned_legacy = True
+                logger.warning("Kein direkter gspread-Zugriff (_open_spreadsheet fehlt) – "
+                               "Uploads laufen über read/concat/update des ganzen Blatts")
+            return None
+        return open_spreadsheet().worksheet(worksheet)
+
+    def existing_sessions(self, worksheet, session_ids):
+        ws = self._worksheet(worksheet)
+        if ws is None:
+            df = self.conn.read(worksheet=worksheet, ttl=0)
+            if df.empty or SESSION_COLUMN not in df.columns:
+                return set()
+            return set(session_ids) & set(df[SESSION_COLUMN].astype(str))
+        header = ws.row_values(1)
+        if SESSION_COLUMN not in header:
+            return set()
+        # Nur die SessionID-Spalte laden, nicht das ganze Blatt
+        return set(session_ids) & set(ws.col_values(header.index(SESSION_COLUMN) + 1))
+
+    def append_rows(self, worksheet, rows):
+        if not rows:
+            return
+        ws = self._worksheet(worksheet)
+        if ws is None:
+            import pandas as pd
+            existing = self.conn.read(worksheet=worksheet, ttl=0)
+            new = pd.DataFrame(rows)
+            data = new if existing.empty else pd.concat([existing, new], ignore_index=True)
+            self.conn.update(worksheet=worksheet, data=data)
+            return
+        with self._header_lock:
+            header = ws.row_values(1)
+            missing = [c for c in dict.fromkeys(k for row in rows for k in row) if c not in header]
+            if missing:
+                # Neue Spalten (z.B. Zeit_bis_Bewertung) an den Header anhängen
+                header = header + missing
+                ws.update([header], "A1")
+        ws.append_rows([[_cell(row.get(c)) for c in header] for row in rows], value_input_option="RAW")
+
+
+class LocalSheetBackend(SheetBackend):
+    """
+    Lokaler Ersatz für die Google-Tabelle (eine CSV-Datei pro Tabellenblatt).
+    Für Tests, Lasttests und Offline-Betrieb; fail_next lässt die nächsten N
+    Aufrufe absichtlich scheitern, um Retry/Backoff zu prüfen.
+    """
+
+    def __init__(self, folder, fail_next=0):
+        self.folder = folder
+        self.fail_next = fail_next
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, worksheet):
+        return os.path.join(self.folder, f"{worksheet}.csv")
+
+    def _maybe_fail(self):
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise ConnectionError("LocalSheetBackend: simulierter Ausfall")
+
+    def read_rows(self, worksheet):
+        path = self._path(worksheet)
+        if not os.path.isfile(path):
+            return []
+        with open(path, encoding="utf-8", newline="") as f:
+            return list(csv.DictReader(f))
+
+    def existing_sessions(self, worksheet, session_ids):
+        with self._lock:
+            self._maybe_fail()
+            return set(session_ids) & {row.get(SESSION_COLUMN) for row in self.read_rows(worksheet)}
+
+    def append_rows(self, worksheet, rows):
+        with self._lock:
+            self._maybe_fail()
+            existing = self.read_rows(worksheet)
+            header = list(existing[0].keys()) if existing else []
+            header += [c for c in dict.fromkeys(k for row in rows for k in row) if c not in header]
+            path = self._path(worksheet)
+            rewrite = not existing or any(c not in existing[0] for c in header)
+            with open(path, "w" if rewrite else "a", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=header)
+                if rewrite:
+                    writer.writeheader()
+                    writer.writerows(existing)
+                writer.writerows({c: _cell(row.get(c)) for c in header} for row in rows)
+
+
+class UploadLog:
+    """Lokaler Dedupe-Cache: welche SessionIDs sind schon in der Cloud (SQLite)."""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploaded_sessions (session_id TEXT PRIMARY KEY, uploaded_at REAL)"
+        )
+        self._conn.commit()
+
+    def contains(self, session_id):
+        with self._lock:
+            cur = self._conn.execute("SELECT 1 FROM uploaded_sessions WHERE session_id = ?", (session_id,))
+            return cur.fetchone() is not None
+
+    def mark(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO uploaded_sessions VALUES (?, ?)", (session_id, time.time())
+            )
+
+
+class SheetsUploader:
+    """
+    Lädt die Antworten einer Session genau einmal hoch (Idempotenz-Schlüssel: SessionID).
+    Reihenfolge: lokaler Dedupe-Cache -> Prüfung der SessionID-Spalte -> append_rows.
+    Alle Cloud-Aufrufe laufen über den Circuit-Breaker.
+    """
+
+    def __init__(self, backend, upload_log, worksheet=WORKSHEET, attempts=4, base_delay=0.5, breaker=None):
+        self.backend = backend
+        self.upload_log = upload_log
+        self.worksheet = worksheet
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.breaker = breaker or CircuitBreaker()
+
+    def _retry(self, fn):
+        return with_retry(lambda: self.breaker.call(fn), attempts=self.attempts, base_delay=self.base_delay)
+
+    def upload_session(self, session_id, rows):
+        with METRICS.timed("sheets_upload", session_id):
+            return self.upload_many({session_id: rows})[session_id]
+
+    def upload_many(self, jobs):
+        """
+        Mehrere Sessions ({SessionID: rows}) mit einer Existenzprüfung und einem
+        append_rows – so holt der Abgleich nach einem Ausfall alles in einem Rutsch nach.
+        Liefert {SessionID: UPLOADED | DUPLICATE}.
+        """
+        result = {sid: DUPLICATE for sid in jobs if self.upload_log.contains(sid)}
+        todo = [sid for sid in jobs if sid not in result]
+        attempted = set()
+
+        def _append():
+            # Nach einem Fehler kann der Append trotzdem angekommen sein -> vor jedem Versuch prüfen
+            existing = self.backend.existing_sessions(self.worksheet, todo)
+            for sid in existing:
+                result[sid] = UPLOADED if sid in attempted else DUPLICATE
+            new = [sid for sid in todo if sid not in existing]
+            if new:
+                attempted.update(new)
+                self.backend.append_rows(self.worksheet, [row for sid in new for row in jobs[sid]])
+                for sid in new:
+                    result[sid] = UPLOADED
+
+        if todo:
+            self._retry(_append)
+            for sid in todo:
+                self.upload_log.mark(sid)
+        return result
+
+
+# ==========================================================
+# 🧵 HINTERGRUND-UPLOAD (persistente Retry-Queue)
+# ==========================================================
+# Status eines Upload-Jobs
+PENDING = "pending"
+FAILED = "failed"
+FINAL_STATES = (UPLOADED, DUPLICATE)
+# Solange gehört ein Job dem Prozess, der ihn gerade hochlädt (mehrere Prozesse, eine Outbox)
+CLAIM_LEASE_SECONDS = 300.0
+
+
+class UploadJobStore:
+    """
+    Lokale Outbox (SQLite/WAL): ausstehende Uploads (Status per SessionID
+    abfragbar) und offline vergebene Testpersonen-IDs. Überlebt Neustarts.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_jobs ("
+            "session_id TEXT PRIMARY KEY, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, last_error TEXT, next_try REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(upload_jobs)")}
+        for column, kind in (("claimed_by", "TEXT"), ("claimed_until", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE upload_jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_upload_jobs_status ON upload_jobs (status, next_try)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS id_reservations ("
+            "testperson INTEGER PRIMARY KEY, session_id TEXT, reserved_at REAL NOT NULL, "
+            "confirmed INTEGER NOT NULL DEFAULT 0, collided INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS outbox_state (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    def enqueue(self, session_id, rows):
+        """Legt einen Job an; ein bestehender Job derselben Session bleibt unverändert."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO upload_jobs (session_id, payload, status, next_try) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(rows, default=str), PENDING, time.time()),
+            )
+            return cur.rowcount == 1
+
+    def payload(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM upload_jobs WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def status(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, last_error FROM upload_jobs WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def finish(self, session_id, status):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE upload_jobs SET status = ?, last_error = NULL WHERE session_id = ?", (status, session_id)
+            )
+
+    def fail(self, session_id, error, retry_interval):
+        with self._lock, self._conn:
+            attempts = self._conn.execute(
+                "SELECT attempts FROM upload_jobs WHERE session_id = ?", (session_id,)
+            ).fetchone()[0] + 1
+            delay = min(3600.0, retry_interval * 2 ** (attempts - 1))
+            self._conn.execute(
+                "UPDATE upload_jobs SET status = ?, attempts = ?, last_error = ?, next_try = ? WHERE session_id = ?",
+                (FAILED, attempts, str(error), time.time() + delay, session_id),
+            )
+
+    def due(self, limit=100):
+        """SessionIDs, die (erneut) hochgeladen werden sollen und gerade niemandem gehören."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT session_id FROM upload_jobs WHERE status IN (?, ?) AND next_try <= ? "
+                "AND (claimed_until IS NULL OR claimed_until < ?) ORDER BY next_try LIMIT ?",
+                (PENDING, FAILED, now, now, limit),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def claim(self, session_id, owner, lease_seconds=CLAIM_LEASE_SECONDS):
+        """Übernimmt einen offenen Job (atomar); False, wenn ihn gerade ein anderer Prozess hat."""
+        now = time.time()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE upload_jobs SET claimed_by = ?, claimed_until = ? WHERE session_id = ? AND status IN (?, ?) "
+                "AND (claimed_until IS NULL OR claimed_until < ? OR claimed_by = ?)",
+                (owner, now + lease_seconds, session_id, PENDING, FAILED, now, owner),
+            )
+            return cur.rowcount == 1
+
+    def release(self, session_id, owner):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE upload_jobs SET claimed_by = NULL, claimed_until = NULL WHERE session_id = ? AND claimed_by = ?",
+                (session_id, owner),
+            )
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM upload_jobs WHERE status IN (?, ?)", (PENDING, FAILED)
+            ).fetchone()[0]
+
+    # --- IDs, die ohne Abgleich mit der Cloud vergeben wurden ---
+    def mark_id_seed_pending(self):
+        """Der ID-Zähler konnte nicht aus der Cloud übernommen werden."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO outbox_state VALUES ('id_seed_pending', '1')")
+
+    def id_seed_pending(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM outbox_state WHERE key = 'id_seed_pending'").fetchone()
+        return row is not None and row[0] == "1"
+
+    def record_id(self, testperson, session_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO id_reservations (testperson, session_id, reserved_at) VALUES (?, ?, ?)",
+                (int(testperson), session_id, time.time()),
+            )
+
+    def confirm_ids(self, cloud_last_id):
+        """
+        Schließt den Abgleich ab: alle offenen Reservierungen gelten als bestätigt.
+        Liefert die IDs, die es in der Cloud schon gab (die Daten bleiben über die
+        SessionID eindeutig, die Testpersonen-Nummer ist dann aber doppelt).
+        """
+        with self._lock, self._conn:
+            collided = [row[0] for row in self._conn.execute(
+                "SELECT testperson FROM id_reservations WHERE confirmed = 0 AND testperson <= ? ORDER BY testperson",
+                (int(cloud_last_id),),
+            )]
+            self._conn.execute(
+                "UPDATE id_reservations SET collided = 1 WHERE confirmed = 0 AND testperson <= ?", (int(cloud_last_id),)
+            )
+            self._conn.execute("UPDATE id_reservations SET confirmed = 1 WHERE confirmed = 0")
+            self._conn.execute("DELETE FROM outbox_state WHERE key = 'id_seed_pending'")
+        return collided
+
+
+class BackgroundSync:
+    """
+    Führt Cloud-Uploads (und andere langsame Aufgaben wie das Schreiben der
+    Zusammenfassung) in einem Thread-Pool aus. Die Ergebnisseite wartet damit
+    nicht mehr aufs Netz; fehlgeschlagene Uploads bleiben in der Outbox.
+
+    Der Abgleich-Thread holt fällige Uploads gesammelt nach (ein append_rows
+    für bis zu batch_size Sessions) und gleicht offline vergebene IDs mit der
+    Cloud ab (id_seeder liefert die letzte ID der Cloud, allocator.advance_to
+    setzt den Zähler dahinter). Solange der Circuit-Breaker offen ist, wird
+    die Cloud gar nicht angefragt.
+    """
+
+    def __init__(self, uploader, job_store, workers=2, retry_interval=30.0, batch_size=200,
+                 id_seeder=None, allocator=None):
+        from concurrent.futures import ThreadPoolExecutor
+        self.uploader = uploader
+        self.job_store = job_store
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+        self.id_seeder = id_seeder
+        self.allocator = allocator
+        self._owner = uuid.uuid4().hex
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cloud-sync")
+        self._running = set()
+        self._lock = threading.Lock()
+        self._retry_thread = threading.Thread(target=self._retry_loop, name="cloud-sync-retry", daemon=True)
+        self._retry_thread.start()
+
+    @property
+    def offline(self):
+        """True, solange die Cloud als ausgefallen gilt."""
+        return self.uploader.breaker.is_open()
+
+    def submit_upload(self, session_id, rows):
+        self.job_store.enqueue(session_id, rows)
+        self._schedule(session_id)
+
+    def submit_task(self, fn, *args, **kwargs):
+        """Beliebige Hintergrundaufgabe (ohne Persistenz), z.B. lokale Dateien schreiben."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def status(self, session_id):
+        """(status, letzter Fehler) – status ist None, wenn es keinen Job gibt."""
+        return self.job_store.status(session_id)
+
+    def _claim(self, session_id):
+        with self._lock:
+            if session_id in self._running:
+                return False
+            self._running.add(session_id)
+        # Zusätzlich in der Outbox: andere Prozesse lassen den Job dann liegen
+        try:
+            if self.job_store.claim(session_id, self._owner):
+                return True
+        except Exception:
+            logger.exception("Job %s konnte nicht übernommen werden", session_id)
+        with self._lock:
+            self._running.discard(session_id)
+        return False
+
+    def _release(self, session_ids):
+        for session_id in session_ids:
+            try: self.job_store.release(session_id, self._owner)
+            except Exception: logger.exception("Job %s konnte nicht freigegeben werden", session_id)
+        with self._lock:
+            self._running.difference_update(session_ids)
+
+    def _schedule(self, session_id):
+        if self._claim(session_id):
+            self._executor.submit(self._run, session_id)
+
+    def _run(self, session_id):
+        try:
+            rows = self.job_store.payload(session_id)
+            if rows is None:
+                return
+            status = self.uploader.upload_session(session_id, rows)
+            self.job_store.finish(session_id, status)
+        except CloudUnavailable:
+            # Offline: Job bleibt unverändert in der Outbox, der Abgleich holt ihn nach
+            pass
+        except Exception as e:
+            logger.warning("Hintergrund-Upload für %s fehlgeschlagen: %s", session_id, e)
+            self.job_store.fail(session_id, e, self.retry_interval)
+        finally:
+            self._release([session_id])
+
+    def reconcile(self):
+        """Ein Abgleich-Durchlauf; liefert die Anzahl der abgeschlossenen Uploads."""
+        if self.offline:
+            return 0
+        self._reconcile_ids()
+        due = [sid for sid in self.job_store.due(self.batch_size) if self._claim(sid)]
+        if not due:
+            return 0
+        try:
+            jobs = {sid: rows for sid in due if (rows := self.job_store.payload(sid)) is not None}
+            with METRICS.timed("sheets_reconcile"):
+                statuses = self.uploader.upload_many(jobs)
+            # Status setzen, bevor die Jobs freigegeben werden
+            for sid, status in statuses.items():
+                self.job_store.finish(sid, status)
+        except CloudUnavailable:
+            return 0
+        except Exception as e:
+            logger.warning("Abgleich von %d Uploads fehlgeschlagen: %s", len(due), e)
+            for sid in due:
+                self.job_store.fail(sid, e, self.retry_interval)
+            return 0
+        finally:
+            self._release(due)
+        if statuses:
+            logger.info("%d ausstehende Uploads nachgeholt", len(statuses))
+        return len(statuses)
+
+    def _reconcile_ids(self):
+        if self.id_seeder is None or self.allocator is None or not self.job_store.id_seed_pending():
+            return
+        try:
+            last_id = self.uploader.breaker.call(self.id_seeder)
+        except Exception as e:
+            logger.warning("ID-Abgleich mit der Cloud fehlgeschlagen: %s", e)
+            return
+        self.allocator.advance_to(last_id)
+        collided = self.job_store.confirm_ids(last_id)
+        if collided:
+            logger.warning("Offline vergebene Testpersonen-IDs gab es schon in der Cloud: %s", collided)
+
+    def _retry_loop(self):
+        while True:
+            try:
+                self.reconcile()
+            except Exception:
+                logger.exception("Abgleich-Durchlauf fehlgeschlagen")
+            time.sleep(self.retry_interval)
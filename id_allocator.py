@@ -0,0 +1,212 @@
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+from result_store import FileLock
+
+# ==========================================================
+# 🔢 ID-VERGABE & GRUPPEN-ZUTEILUNG (atomar, O(1) pro Start)
+# ==========================================================
+COUNTER_NAME = "testperson"
+STALE_SESSION_SECONDS = 2 * 60 * 60  # Angefangene Sessions zählen so lange für die Balance
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class CounterBackend:
+    """Atomarer Zähler, der ganze Blöcke von IDs auf einmal reserviert."""
+
+    def is_initialized(self):
+        raise NotImplementedError
+
+    def initialize(self, last_id):
+        """Setzt den Zähler auf last_id (nur, wenn er noch nicht existiert)."""
+        raise NotImplementedError
+
+    def reserve(self, count):
+        """Reserviert count IDs und gibt die erste zurück: [first, first + count)."""
+        raise NotImplementedError
+
+    def advance_to(self, last_id):
+        """Setzt den Zähler auf mindestens last_id (nach einem Abgleich mit der Cloud)."""
+        raise NotImplementedError
+
+
+class SqliteCounterBackend(CounterBackend):
+    def __init__(self, path):
+        self._conn = _connect(path)
+        self._lock = threading.Lock()
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def is_initialized(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM counters WHERE name = ?", (COUNTER_NAME,)).fetchone() is not None
+
+    def initialize(self, last_id):
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO counters VALUES (?, ?)", (COUNTER_NAME, int(last_id)))
+
+    def reserve(self, count):
+        with self._lock:
+            # BEGIN IMMEDIATE: Schreib-Lock sofort, damit zwei Prozesse nie denselben Block bekommen
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR IGNORE INTO counters VALUES (?, 0)", (COUNTER_NAME,))
+                last = self._conn.execute("SELECT value FROM counters WHERE name = ?", (COUNTER_NAME,)).fetchone()[0]
+                self._conn.execute("UPDATE counters SET value = ? WHERE name = ?", (last + count, COUNTER_NAME))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return last + 1
+
+    def advance_to(self, last_id):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)",
+                (COUNTER_NAME, int(last_id)),
+            )
+
+
+class FileCounterBackend(CounterBackend):
+    """Zähler als Textdatei, geschützt durch einen Datei-Lock (ohne SQLite)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, value):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(value))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def is_initialized(self):
+        return self._read() is not None
+
+    def initialize(self, last_id):
+        with FileLock(self.path):
+            if self._read() is None:
+                self._write(int(last_id))
+
+    def reserve(self, count):
+        with FileLock(self.path):
+            last = self._read() or 0
+            self._write(last + count)
+        return last + 1
+
+    def advance_to(self, last_id):
+        with FileLock(self.path):
+            self._write(max(self._read() or 0, int(last_id)))
+
+
+class IdAllocator:
+    """
+    Vergibt Testpersonen-IDs aus vorab reservierten Blöcken. Pro Block ist nur
+    ein Zugriff auf das Backend nötig; alle weiteren Starts in diesem Prozess
+    kosten nur einen Lock im Speicher. Nicht vergebene IDs eines Blocks gehen
+    bei einem Neustart verloren (Lücken sind erlaubt, Duplikate nicht).
+    """
+
+    def __init__(self, backend, block_size=10):
+        self.backend = backend
+        self.block_size = block_size
+        self._ids = collections.deque()
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            if not self._ids:
+                first = self.backend.reserve(self.block_size)
+                self._ids.extend(range(first, first + self.block_size))
+            return self._ids.popleft()
+
+    def advance_to(self, last_id):
+        """Zähler hinter last_id setzen; bereits reservierte, kleinere IDs werden verworfen."""
+        with self._lock:
+            self.backend.advance_to(last_id)
+            self._ids = collections.deque(i for i in self._ids if i > last_id)
+
+
+class GroupBalancer:
+    """
+    Teilt neue Sessions der Gruppe mit den wenigsten abgeschlossenen
+    (bzw. gerade laufenden) Sessions zu. Abbrecher verzerren die Verteilung so
+    nicht mehr, und bei Gleichstand entscheidet wie bisher die ID (id % 3).
+    """
+
+    def __init__(self, path, stale_seconds=STALE_SESSION_SECONDS):
+        self.stale_seconds = stale_seconds
+        self._conn = _connect(path)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, gruppe TEXT NOT NULL, started_at REAL NOT NULL, completed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_open ON sessions (completed_at, started_at)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS group_completed (gruppe TEXT PRIMARY KEY, n INTEGER NOT NULL)")
+
+    def assign(self, session_id, group_mapping, preferred):
+        """Wählt eine Gruppe aus group_mapping (rest -> gruppe) und merkt sich die Session."""
+        order = [group_mapping[(preferred + k) % len(group_mapping)] for k in range(len(group_mapping))]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                load = dict.fromkeys(order, 0)
+                for gruppe, n in self._conn.execute("SELECT gruppe, n FROM group_completed"):
+                    if gruppe in load: load[gruppe] += n
+                cur = self._conn.execute(
+                    "SELECT gruppe, COUNT(*) FROM sessions WHERE completed_at IS NULL AND started_at > ? GROUP BY gruppe",
+                    (time.time() - self.stale_seconds,),
+                )
+                for gruppe, n in cur:
+                    if gruppe in load: load[gruppe] += n
+                # min() nimmt bei Gleichstand den ersten Eintrag -> bevorzugte Gruppe zuerst
+                gruppe = min(order, key=lambda g: load[g])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, NULL)", (session_id, gruppe, time.time())
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return gruppe
+
+    def complete(self, session_id, gruppe):
+        """Markiert eine Session als abgeschlossen (idempotent)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = self._conn.execute(
+                    "UPDATE sessions SET completed_at = ? WHERE session_id = ? AND completed_at IS NULL",
+                    (time.time(), session_id),
+                )
+                if cur.rowcount == 0:
+                    # Unbekannte Session (z.B. vor dem Update gestartet) -> trotzdem einmal zählen
+                    cur = self._conn.execute(
+                        "INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?)",
+                        (session_id, gruppe, time.time(), time.time()),
+                    )
+                if cur.rowcount:
+                    self._conn.execute(
+                        "INSERT INTO group_completed VALUES (?, 1) ON CONFLICT(gruppe) DO UPDATE SET n = n + 1",
+                        (gruppe,),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
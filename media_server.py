@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# ==========================================================
+# 🎬 MEDIA-SERVER (HTTP-Range / ETag / Cache-Control)
+# ==========================================================
+# Statt st.video(pfad) (Streamlit liest die ganze Datei in den RAM und schickt sie
+# bei jedem Rerun über den Media-File-Manager) liefert dieser kleine Sidecar die
+# Clips direkt von der Platte aus. Browser können so streamen (Range) und die
+# Clips über Reruns hinweg cachen (ETag + Cache-Control).
+#
+# Clips werden nur über einen undurchsichtigen Schlüssel (video_catalog.media_key)
+# ausgeliefert: der echte Pfad enthält Real/Fake und den Generator, also die
+# Antwort. Der Server kennt nur Clips aus dem Katalog (lookup), keine anderen
+# Dateien unter videos/ (z.B. manifest.json).
+URL_PREFIX = "/v/"
+CACHE_MAX_AGE = 24 * 60 * 60
+COPY_CHUNK_SIZE = 256 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_KEY_RE = re.compile(r"^([0-9a-f]{16,64})(?:\.mp4)?$")
+
+
+def video_url(base_url, key):
+    """URL eines Clips (per media_key) auf dem Media-Server."""
+    return f"{base_url.rstrip('/')}{URL_PREFIX}{key}.mp4"
+
+
+def _etag(info):
+    return f'"{info.st_size:x}-{info.st_mtime_ns:x}"'
+
+
+class VideoRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    video_root = "videos"
+
+    @staticmethod
+    def lookup(key):
+        """media_key -> full_path relativ zu video_root (oder None)."""
+        return None
+
+    def log_message(self, format, *args):
+        # Kein Log pro Range-Request (ein Clip = viele Requests)
+        pass
+
+    def _resolve(self):
+        path = urlsplit(self.path).path
+        if not path.startswith(URL_PREFIX):
+            return None
+        m = _KEY_RE.match(path[len(URL_PREFIX):])
+        rel = self.lookup(m.group(1)) if m else None
+        if rel is None:
+            return None
+        root = os.path.realpath(self.video_root)
+        full = os.path.realpath(os.path.join(root, rel))
+        # Kein Zugriff außerhalb des videos-Ordners (../)
+        if os.path.commonpath([root, full]) != root or not os.path.isfile(full):
+            return None
+        return full
+
+    def _send_empty(self, status, headers=()):
+        self.send_response(status)
+        for key, value in headers:
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _parse_range(self, size):
+        """Liefert (start, end) inkl. oder None (ganze Datei); ValueError bei ungültigem Range."""
+        header = self.headers.get("Range")
+        if not header:
+            return None
+        # If-Range: Range nur beachten, wenn der Client noch die aktuelle Version hat
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range != self._current_etag:
+            return None
+        m = _RANGE_RE.match(header.strip())
+        if not m or (not m.group(1) and not m.group(2)):
+            # Mehrfach-Ranges o.ä. -> ganze Datei ausliefern
+            return None
+        if not m.group(1):
+            length = int(m.group(2))
+            if length == 0:
+                raise ValueError
+            return max(0, size - length), size - 1
+        start = int(m.group(1))
+        end = int(m.group(2)) if m.group(2) else size - 1
+        if start >= size or end < start:
+            raise ValueError
+        return start, min(end, size - 1)
+
+    def _handle(self, send_body):
+        full = self._resolve()
+        if full is None:
+            self._send_empty(404)
+            return
+        info = os.stat(full)
+        self._current_etag = _etag(info)
+        common = [
+            ("ETag", self._current_etag),
+            ("Last-Modified", formatdate(info.st_mtime, usegmt=True)),
+            ("Cache-Control", f"public, max-age={CACHE_MAX_AGE}"),
+            ("Accept-Ranges", "bytes"),
+        ]
+        if self.headers.get("If-None-Match") == self._current_etag:
+            self._send_empty(304, common)
+            return
+        size = info.st_size
+        try:
+            byte_range = self._parse_range(size)
+        except ValueError:
+            self._send_empty(416, common + [("Content-Range", f"bytes */{size}")])
+            return
+
+        start, end = byte_range if byte_range else (0, size - 1)
+        length = max(0, end - start + 1)
+        self.send_response(206 if byte_range else 200)
+        for key, value in common:
+            self.send_header(key, value)
+        self.send_header("Content-Type", "video/mp4" if full.lower().endswith(".mp4") else "application/octet-stream")
+        self.send_header("Content-Length", str(length))
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not send_body:
+            return
+        try:
+            with open(full, "rb") as f:
+                f.seek(start)
+                remaining = length
+                while remaining > 0:
+                    chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # Browser bricht Range-Requests beim Spulen/Seitenwechsel regelmäßig ab
+            pass
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+
+def start_media_server(video_root, lookup, host="127.0.0.1", port=8502):
+    """
+    Startet den Media-Server in einem Daemon-Thread und gibt den Server zurück.
+    lookup(media_key) liefert den Pfad eines Katalog-Clips; standardmäßig nur auf
+    localhost erreichbar (davor ein Reverse-Proxy, siehe MEDIA_BASE_URL).
+    """
+    handler = type("BoundVideoRequestHandler", (VideoRequestHandler,),
+                   {"video_root": video_root, "lookup": staticmethod(lookup)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="media-server", daemon=True)
+    thread.start()
+    return server
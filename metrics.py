@@ -0,0 +1,140 @@
+import collections
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================================
+# 📈 METRIKEN (Dauer + Zähler pro Phase und Session)
+# ==========================================================
+# Histogramm-Grenzen in Sekunden (Prometheus "le")
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+MAX_SESSIONS = 1000  # so viele Sessions behalten wir pro Prozess im Speicher
+
+
+class Metrics:
+    """
+    Prozessweite Messwerte: pro Phase ein Histogramm (Prometheus-Textformat),
+    pro Session die Summe je Phase, plus optional jedes Ereignis als JSON-Zeile
+    in einer rotierenden Logdatei.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hist = {}       # stage -> [bucket counts..., sum, count]
+        self._counters = collections.Counter()
+        self._sessions = collections.OrderedDict()  # session_id -> {stage: [count, sum]}
+        self._log = None
+
+    def enable_jsonl(self, path, max_bytes=10 * 1024 * 1024, backups=5):
+        """Schreibt jedes Ereignis zusätzlich als JSON-Zeile (rotierend) nach path."""
+        logger = logging.getLogger("studie.metrics")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        if not logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        self._log = logger
+
+    def observe(self, stage, seconds, session_id=None):
+        with self._lock:
+            hist = self._hist.get(stage)
+            if hist is None:
+                hist = self._hist[stage] = [0] * len(BUCKETS) + [0.0, 0]
+            for i, le in enumerate(BUCKETS):
+                if seconds <= le:
+                    hist[i] += 1
+            hist[-2] += seconds
+            hist[-1] += 1
+            if session_id:
+                per_session = self._sessions.pop(session_id, None) or {}
+                entry = per_session.setdefault(stage, [0, 0.0])
+                entry[0] += 1
+                entry[1] += seconds
+                self._sessions[session_id] = per_session
+                while len(self._sessions) > MAX_SESSIONS:
+                    self._sessions.popitem(last=False)
+        if self._log is not None:
+            self._log.info(json.dumps({"ts": round(time.time(), 3), "stage": stage, "ms": round(seconds * 1000, 3), "session": session_id}))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] += n
+
+    @contextmanager
+    def timed(self, stage, session_id=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0, session_id)
+
+    def session_summary(self, session_id):
+        """{stage: {"count": n, "seconds": summe}} für eine Session."""
+        with self._lock:
+            data = self._sessions.get(session_id, {})
+            return {stage: {"count": c, "seconds": round(s, 6)} for stage, (c, s) in data.items()}
+
+    def end_session(self, session_id):
+        """Summen einer abgeschlossenen Session als eine JSON-Zeile loggen und vergessen."""
+        summary = self.session_summary(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self._log is not None and summary:
+            self._log.info(json.dumps({"ts": round(time.time(), 3), "event": "session", "session": session_id, "stages": summary}))
+        return summary
+
+    def render_prometheus(self):
+        lines = [
+            "# HELP studie_stage_seconds Dauer der Verarbeitungsschritte",
+            "# TYPE studie_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, hist in sorted(self._hist.items()):
+                for le, n in zip(BUCKETS, hist):
+                    le_text = "+Inf" if le == float("inf") else repr(le)
+                    lines.append(f'studie_stage_seconds_bucket{{stage="{stage}",le="{le_text}"}} {n}')
+                lines.append(f'studie_stage_seconds_sum{{stage="{stage}"}} {hist[-2]:.6f}')
+                lines.append(f'studie_stage_seconds_count{{stage="{stage}"}} {hist[-1]}')
+            lines += ["# HELP studie_events_total Zähler", "# TYPE studie_events_total counter"]
+            for name, n in sorted(self._counters.items()):
+                lines.append(f'studie_events_total{{name="{name}"}} {n}')
+            lines += ["# TYPE studie_sessions_tracked gauge", f"studie_sessions_tracked {len(self._sessions)}"]
+        return "\n".join(lines) + "\n"
+
+
+# Ein Registry-Objekt pro Prozess (wie logging)
+METRICS = Metrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = METRICS
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port, host="127.0.0.1", metrics=METRICS):
+    """Stellt /metrics im Prometheus-Textformat bereit (Daemon-Thread)."""
+    handler = type("BoundMetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
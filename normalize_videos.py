@@ -0,0 +1,188 @@
+"""
+Erzeugt die drei Gruppenordner unter videos/ neu aus einem Quellordner.
+
+    python normalize_videos.py --source videos_quelle
+    python normalize_videos.py --source videos_quelle --group normalisiert_ohne_Ton --workers 4
+
+Erwartete Struktur: <source>/Real/*.mp4 und <source>/Fake/*.mp4.
+Pro Gruppe wird ein manifest.json geschrieben (Bitrate, Dauer, Codec, SHA-256),
+das video_catalog.VideoCatalog direkt übernimmt. Unveränderte Quellen (gleicher
+Hash, gleiches Profil) werden übersprungen.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from video_catalog import LABEL_FOLDERS, MANIFEST_NAME, VIDEO_EXTENSIONS, file_sha256, probe_video
+
+# ==========================================================
+# 🎛️ PROFILE (Ordnername -> ffmpeg-Einstellungen)
+# ==========================================================
+PROFILES = {
+    "normalisiert_720p_40fps": {"height": 720, "fps": 40, "audio": True},
+    "normalisiert_1080p_60fps": {"height": 1080, "fps": 60, "audio": True},
+    "normalisiert_ohne_Ton": {"height": 720, "fps": 40, "audio": False},
+}
+VIDEO_ROOT = "videos"
+CRF = 20
+PRESET = "medium"
+SOURCE_HASH_CACHE = ".hash_cache.json"
+
+
+def profile_key(profile):
+    """Fingerprint der Einstellungen – ändert sich das Profil, wird neu kodiert."""
+    data = dict(profile, crf=CRF, preset=PRESET)
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def ffmpeg_command(src, dst, profile):
+    cmd = [
+        "ffmpeg", "-y", "-v", "error", "-i", src,
+        "-vf", f"scale=-2:{profile['height']},fps={profile['fps']}",
+        "-c:v", "libx264", "-preset", PRESET, "-crf", str(CRF), "-pix_fmt", "yuv420p",
+    ]
+    cmd += ["-c:a", "aac", "-b:a", "128k"] if profile["audio"] else ["-an"]
+    # moov-Atom an den Anfang: der Browser kann sofort abspielen
+    cmd += ["-movflags", "+faststart", "-f", "mp4", dst]
+    return cmd
+
+
+def encode_clip(src, dst, profile):
+    """Kodiert einen Clip (läuft im Prozess-Pool) und liefert die Manifest-Daten."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    # Temporärer Name ohne Video-Endung, damit der Katalog halbfertige Dateien ignoriert
+    tmp = dst + ".part"
+    subprocess.run(ffmpeg_command(src, tmp, profile), check=True)
+    os.replace(tmp, dst)
+    info = os.stat(dst)
+    duration, codec = probe_video(dst)
+    return {
+        "size": info.st_size,
+        "mtime": info.st_mtime_ns,
+        "duration": duration,
+        "codec": codec,
+        "bitrate": int(info.st_size * 8 / duration) if duration else None,
+        "sha256": file_sha256(dst),
+    }
+
+
+def _load_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def source_hashes(source):
+    """SHA-256 aller Quellclips; per (Größe, mtime) gecacht, damit ein Lauf ohne Änderungen nur stat() kostet."""
+    cache_path = os.path.join(source, SOURCE_HASH_CACHE)
+    cache = _load_json(cache_path)
+    result = {}
+    for label in LABEL_FOLDERS:
+        folder = os.path.join(source, label)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            rel = f"{label}/{name}"
+            info = os.stat(os.path.join(folder, name))
+            old = cache.get(rel)
+            if old and old["size"] == info.st_size and old["mtime"] == info.st_mtime_ns:
+                result[rel] = old["sha256"]
+                continue
+            result[rel] = file_sha256(os.path.join(folder, name))
+            cache[rel] = {"size": info.st_size, "mtime": info.st_mtime_ns, "sha256": result[rel]}
+    _save_json(cache_path, {k: v for k, v in cache.items() if k in result})
+    return result
+
+
+def normalize(source, video_root=VIDEO_ROOT, groups=None, workers=None, prune=False, dry_run=False):
+    hashes = source_hashes(source)
+    jobs = []
+    manifests = {}
+    for group in groups or PROFILES:
+        profile = PROFILES[group]
+        key = profile_key(profile)
+        group_dir = os.path.join(video_root, group)
+        manifest_path = os.path.join(group_dir, MANIFEST_NAME)
+        manifest = _load_json(manifest_path)
+        if manifest.get("profile_key") != key:
+            manifest = {"profile_key": key, "profile": profile, "clips": {}}
+        manifests[group] = (manifest_path, manifest)
+        for rel, src_hash in hashes.items():
+            # Ausgabe immer als .mp4 (Name bleibt, Endung wird vereinheitlicht)
+            out_rel = os.path.splitext(rel)[0] + ".mp4"
+            dst = os.path.join(group_dir, *out_rel.split("/"))
+            clip = manifest["clips"].get(out_rel)
+            if clip and clip.get("source_sha256") == src_hash and os.path.isfile(dst):
+                continue
+            jobs.append((group, out_rel, src_hash, os.path.join(source, *rel.split("/")), dst, profile))
+        if prune:
+            wanted = {os.path.splitext(rel)[0] + ".mp4" for rel in hashes}
+            for out_rel in [r for r in manifest["clips"] if r not in wanted]:
+                print(f"- {group}/{out_rel}")
+                if not dry_run:
+                    try: os.remove(os.path.join(group_dir, *out_rel.split("/")))
+                    except OSError: pass
+                    del manifest["clips"][out_rel]
+
+    print(f"{len(hashes)} Quellclips, {len(jobs)} zu kodieren")
+    if dry_run:
+        for group, out_rel, *_ in jobs:
+            print(f"+ {group}/{out_rel}")
+        return 0
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(encode_clip, src, dst, profile): (group, out_rel, src_hash)
+                   for group, out_rel, src_hash, src, dst, profile in jobs}
+        for future in as_completed(futures):
+            group, out_rel, src_hash = futures[future]
+            try:
+                clip = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"! {group}/{out_rel}: {e}", file=sys.stderr)
+                continue
+            clip["source_sha256"] = src_hash
+            manifests[group][1]["clips"][out_rel] = clip
+            print(f"✓ {group}/{out_rel}")
+
+    for manifest_path, manifest in manifests.values():
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        _save_json(manifest_path, manifest)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gruppenordner der Deepfake-Studie mit ffmpeg neu erzeugen")
+    parser.add_argument("--source", required=True, help="Quellordner mit Real/ und Fake/")
+    parser.add_argument("--videos", default=VIDEO_ROOT, help="Zielordner (Standard: videos)")
+    parser.add_argument("--group", action="append", choices=sorted(PROFILES), help="nur diese Gruppe(n)")
+    parser.add_argument("--workers", type=int, default=None, help="parallele ffmpeg-Prozesse (Standard: CPU-Kerne)")
+    parser.add_argument("--prune", action="store_true", help="Clips ohne Quelle löschen")
+    parser.add_argument("--dry-run", action="store_true", help="nur anzeigen, was kodiert würde")
+    args = parser.parse_args(argv)
+
+    if not args.dry_run and shutil.which("ffmpeg") is None:
+        parser.error("ffmpeg wurde nicht gefunden (muss im PATH liegen)")
+    failed = normalize(args.source, args.videos, args.group, args.workers, args.prune, args.dry_run)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+
+import streamlit.components.v1 as components
+
+# ==========================================================
+# ▶️ WIEDERGABE-MELDUNGEN AUS DEM BROWSER
+# ==========================================================
+# Der Server sieht nur, wann er die Seite rendert – nicht, wann das Video im
+# Browser wirklich anläuft. Diese unsichtbare Komponente hängt sich an das
+# Video-Element (st.video) und meldet playing/pause/ended samt der bis dahin
+# tatsächlich abgespielten Sekunden zurück.
+_FRONTEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "playback_frontend")
+_component = components.declare_component("playback_reporter", path=_FRONTEND)
+
+
+def playback_event(key):
+    """Letzte Meldung {"event", "played", "seq"} des Videos auf der Seite – None, solange nichts kam."""
+    return _component(key=key, default=None)
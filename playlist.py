@@ -0,0 +1,77 @@
+import random
+from array import array
+
+from video_catalog import generator_from_filename
+
+# ==========================================================
+# 🎲 PLAYLISTS (stratifiziert nach Label und Generator)
+# ==========================================================
+
+
+class PlaylistGenerator:
+    """
+    Baut pro Session eine ausgewogene Videoreihenfolge aus dem Katalog.
+
+    Die Strata (Gruppe -> Label -> Generator -> Katalog-Indizes) werden einmal
+    pro Katalog-Version berechnet. Eine Playlist ist danach nur noch eine
+    Funktion von (Gruppe, Seed, Teilnehmer) und wird als kompaktes
+    Integer-Array gespeichert – ein Restore rechnet sie aus dem Seed neu.
+
+    Ausgewogenheit:
+      * Echt/Fake möglichst 50/50; bei ungerader Anzahl wechselt das
+        zusätzliche Video je Teilnehmer (Gegenbalancierung).
+      * Innerhalb eines Labels reihum über die Generatoren; welcher Generator
+        bei ungleicher Aufteilung mehr Clips bekommt, rotiert je Teilnehmer.
+      * Die Reihenfolge selbst wird per Seed gemischt.
+    """
+
+    def __init__(self, entries):
+        self.strata = {}
+        for idx, entry in enumerate(entries):
+            label = entry["label"]
+            gen = generator_from_filename(entry["filename"], label)
+            self.strata.setdefault(entry["gruppe"], {}).setdefault(label, {}).setdefault(gen, []).append(idx)
+
+    def group_size(self, group):
+        return sum(len(v) for gens in self.strata.get(group, {}).values() for v in gens.values())
+
+    def playlist(self, group, n, seed, participant=0):
+        """Liefert array('H') mit Katalog-Indizes (leer, wenn die Gruppe keine Videos hat)."""
+        strata = self.strata.get(group)
+        if not strata:
+            return array('H')
+        rng = random.Random(f"{group}:{seed}")
+        labels = sorted(strata)
+        avail = {label: sum(len(v) for v in strata[label].values()) for label in labels}
+        n = min(n, sum(avail.values()))
+
+        quota = {label: n // len(labels) for label in labels}
+        for k in range(n - sum(quota.values())):
+            quota[labels[(participant + k) % len(labels)]] += 1
+        # Fehlende Clips eines Labels mit dem anderen Label auffüllen
+        overflow = sum(max(0, quota[label] - avail[label]) for label in labels)
+        for label in labels:
+            quota[label] = min(quota[label], avail[label])
+        for label in labels:
+            extra = min(overflow, avail[label] - quota[label])
+            quota[label] += extra
+            overflow -= extra
+
+        picked = []
+        for label in labels:
+            picked += self._pick(strata[label], quota[label], rng, participant)
+        rng.shuffle(picked)
+        return array('H', picked)
+
+    @staticmethod
+    def _pick(generators, k, rng, participant):
+        queues = {gen: rng.sample(idx, len(idx)) for gen, idx in sorted(generators.items())}
+        order = list(queues)
+        shift = participant % len(order)
+        order = order[shift:] + order[:shift]
+        picked = []
+        while len(picked) < k:
+            for gen in order:
+                if queues[gen] and len(picked) < k:
+                    picked.append(queues[gen].pop())
+        return picked
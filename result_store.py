@@ -0,0 +1,496 @@
+import atexit
+import csv
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from metrics import METRICS
+
+# ==========================================================
+# 💾 ERGEBNIS-SPEICHER (gepufferter Writer + austauschbare Sinks)
+# ==========================================================
+# Spaltenreihenfolge wie bisher in ergebnisse.csv
+RESULT_COLUMNS = [
+    "Zeitstempel", "Testperson", "Gruppe", "SessionID", "Video",
+    "Antwort_User", "Korrektes_Label", "Erfolg", "Wahl_Mapped", "Zeit_bis_Bewertung", "Abspieldauer",
+]
+# Umbenannte Spalten (alt -> neu). "Sichtdauer" war keine Sichtdauer: sie zählt ab dem
+# Rendern der Seite. Die im Browser gemessene Wiedergabe steht in "Abspieldauer".
+RENAMED_COLUMNS = {"Sichtdauer": "Zeit_bis_Bewertung"}
+CSV_SEP = ';'
+
+# fsync-Politik: "always" = nach jedem Batch, "never" = dem OS überlassen
+FSYNC_ALWAYS = "always"
+FSYNC_NEVER = "never"
+
+logger = logging.getLogger(__name__)
+
+
+def _coerce_csv_row(row):
+    """CSV liefert nur Strings -> Typen wie in save_result() (Erfolg int, Zeiten float)."""
+    row = {k: (None if v == "" else v) for k, v in row.items()}
+    try: row["Erfolg"] = int(row["Erfolg"])
+    except (KeyError, TypeError, ValueError): pass
+    for col in ("Zeit_bis_Bewertung", "Abspieldauer"):
+        try: row[col] = float(row[col])
+        except (KeyError, TypeError, ValueError): pass
+    return row
+
+
+class FileLock:
+    """Exklusiver Lock über eine .lock-Datei (fcntl unter Linux/macOS, msvcrt unter Windows)."""
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._fh = None
+
+    def __enter__(self):
+        self._fh = open(self.path, "a+")
+        if os.name == "nt":
+            import msvcrt
+            self._fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gibt nach ~10 s auf -> erneut versuchen
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if os.name == "nt":
+                import msvcrt
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._fh.close()
+            self._fh = None
+
+
+class PartialWriteError(Exception):
+    """Nicht alle Sinks haben geschrieben; die fehlenden Zeilen hat der Sink selbst vorgemerkt."""
+
+
+class ResultSink:
+    """Schnittstelle für Ergebnis-Speicher. write_rows() bekommt immer einen ganzen Batch."""
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def has_backlog(self):
+        """True, wenn der Sink noch Zeilen aus einem fehlgeschlagenen Batch nachschreiben muss."""
+        return False
+
+    def read_session(self, session_id):
+        """Alle Zeilen einer Session in Schreibreihenfolge (für den Restore nach Reload)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class CsvResultSink(ResultSink):
+    """Die bisherige ergebnisse.csv – jetzt mit Datei-Lock und einem Append pro Batch."""
+
+    def __init__(self, path, fsync=FSYNC_ALWAYS):
+        self.path = path
+        self.fsync = fsync
+
+    def _read_header(self):
+        if not os.path.isfile(self.path) or os.path.getsize(self.path) == 0:
+            return None
+        with open(self.path, encoding="utf-8", newline="") as f:
+            return next(csv.reader(f, delimiter=CSV_SEP), None)
+
+    def _rewrite_with_header(self, columns):
+        # Ältere Datei ohne neue Spalten (z.B. Zeit_bis_Bewertung) -> einmalig mit neuem Header umschreiben
+        with open(self.path, encoding="utf-8", newline="") as f:
+            old_rows = [{RENAMED_COLUMNS.get(k, k): v for k, v in row.items()} for row in csv.DictReader(f, delimiter=CSV_SEP)]
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, delimiter=CSV_SEP)
+            writer.writeheader()
+            writer.writerows(old_rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def write_rows(self, rows):
+        with FileLock(self.path):
+            header = self._read_header()
+            columns = [RENAMED_COLUMNS.get(c, c) for c in header] if header else list(RESULT_COLUMNS)
+            missing = [c for row in rows for c in row if c not in columns]
+            if missing:
+                columns = columns + list(dict.fromkeys(missing))
+            if header is not None and columns != header:
+                self._rewrite_with_header(columns)
+                header = columns
+            with open(self.path, "a", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=columns, delimiter=CSV_SEP)
+                if header is None:
+                    writer.writeheader()
+                writer.writerows(rows)
+                f.flush()
+                if self.fsync == FSYNC_ALWAYS:
+                    os.fsync(f.fileno())
+
+    def read_session(self, session_id):
+        # Fallback ohne Index: die Datei wird einmal zeilenweise gefiltert
+        if not os.path.isfile(self.path):
+            return []
+        with open(self.path, encoding="utf-8", newline="") as f:
+            return [_coerce_csv_row(row) for row in csv.DictReader(f, delimiter=CSV_SEP) if row.get("SessionID") == session_id]
+
+
+class SqliteResultSink(ResultSink):
+    """Append-only SQLite-Tabelle im WAL-Modus (mehrere Prozesse können parallel schreiben)."""
+
+    def __init__(self, path, fsync=FSYNC_ALWAYS):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=%s" % ("FULL" if fsync == FSYNC_ALWAYS else "NORMAL"))
+        cols = ", ".join(f'"{c}"' for c in RESULT_COLUMNS)
+        # Schema anlegen/migrieren unter Schreib-Lock (mehrere Prozesse starten gleichzeitig)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS ergebnisse ({cols})")
+            self._migrate_columns()
+            # Index für den Restore: ein Reload kostet O(Antworten dieser Session)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ergebnisse_session ON ergebnisse (SessionID)")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_columns(self):
+        """Ältere Tabellen: umbenannte Spalten umbenennen, fehlende ergänzen."""
+        existing = [row[1] for row in self._conn.execute("PRAGMA table_info(ergebnisse)")]
+        for old, new in RENAMED_COLUMNS.items():
+            if old in existing and new not in existing:
+                self._conn.execute(f'ALTER TABLE ergebnisse RENAME COLUMN "{old}" TO "{new}"')
+                existing[existing.index(old)] = new
+        for c in RESULT_COLUMNS:
+            if c not in existing:
+                self._conn.execute(f'ALTER TABLE ergebnisse ADD COLUMN "{c}"')
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM ergebnisse LIMIT 1").fetchone() is None
+
+    def backfill_from_csv(self, csv_path):
+        """
+        Übernimmt eine bestehende ergebnisse.csv einmalig in die (leere) Tabelle.
+        Prüfung und Insert in einer Transaktion (BEGIN IMMEDIATE): starten mehrere
+        Prozesse gleichzeitig, übernimmt nur der erste, die anderen sehen die Zeilen.
+        """
+        if not os.path.isfile(csv_path):
+            return 0
+        cols = ", ".join(f'"{c}"' for c in RESULT_COLUMNS)
+        marks = ", ".join("?" for _ in RESULT_COLUMNS)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = []
+                if self._conn.execute("SELECT 1 FROM ergebnisse LIMIT 1").fetchone() is None:
+                    with open(csv_path, encoding="utf-8", newline="") as f:
+                        rows = [_coerce_csv_row({RENAMED_COLUMNS.get(k, k): v for k, v in row.items()})
+                                for row in csv.DictReader(f, delimiter=CSV_SEP)]
+                    self._conn.executemany(
+                        f"INSERT INTO ergebnisse ({cols}) VALUES ({marks})",
+                        [tuple(row.get(c) for c in RESULT_COLUMNS) for row in rows],
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def read_session(self, session_id):
+        cols = ", ".join(f'"{c}"' for c in RESULT_COLUMNS)
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT {cols} FROM ergebnisse WHERE SessionID = ? ORDER BY rowid", (session_id,)
+            )
+            return [dict(zip(RESULT_COLUMNS, row)) for row in cur.fetchall()]
+
+    def write_rows(self, rows):
+        cols = ", ".join(f'"{c}"' for c in RESULT_COLUMNS)
+        marks = ", ".join("?" for _ in RESULT_COLUMNS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO ergebnisse ({cols}) VALUES ({marks})",
+                [tuple(row.get(c) for c in RESULT_COLUMNS) for row in rows],
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ParquetResultSink(ResultSink):
+    """Ein Parquet-File pro Batch, partitioniert nach Datum (benötigt pandas + pyarrow)."""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def write_rows(self, rows):
+        import pandas as pd
+        part_dir = os.path.join(self.folder, f"datum={datetime.now():%Y-%m-%d}")
+        os.makedirs(part_dir, exist_ok=True)
+        name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp = os.path.join(part_dir, "." + name)
+        pd.DataFrame(rows, columns=RESULT_COLUMNS).to_parquet(tmp, index=False)
+        os.replace(tmp, os.path.join(part_dir, name))
+
+
+class MultiSink(ResultSink):
+    """
+    Schreibt denselben Batch in mehrere Sinks (z.B. CSV für Forscher + SQLite als Index).
+    Scheitert ein Sink, merkt er sich die Zeilen nur für diesen Sink und schreibt sie
+    beim nächsten Aufruf nach – die anderen Sinks bekommen den Batch kein zweites Mal.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self._backlog = {}  # Index des Sinks -> Zeilen, die dort noch fehlen
+
+    def has_backlog(self):
+        return bool(self._backlog)
+
+    def write_rows(self, rows):
+        failed = []
+        for i, sink in enumerate(self.sinks):
+            batch = self._backlog.get(i, []) + list(rows)
+            if not batch:
+                continue
+            try:
+                sink.write_rows(batch)
+            except Exception as e:
+                self._backlog[i] = batch
+                failed.append(f"{type(sink).__name__}: {e}")
+            else:
+                self._backlog.pop(i, None)
+        if failed:
+            raise PartialWriteError("; ".join(failed))
+
+    def read_session(self, session_id):
+        # Bevorzugt einen vollständigen Sink mit Index (SQLite), sonst den ersten, der lesen kann
+        readers = sorted(
+            self.sinks,
+            key=lambda sink: (self.sinks.index(sink) in self._backlog, not isinstance(sink, SqliteResultSink)),
+        )
+        for sink in readers:
+            try:
+                return sink.read_session(session_id)
+            except NotImplementedError:
+                continue
+        raise NotImplementedError
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def make_result_sink(kind, data_folder, fsync=FSYNC_ALWAYS):
+    """Baut einen Sink aus einer kommagetrennten Liste, z.B. "csv" oder "csv,sqlite"."""
+    sinks = []
+    for name in [k.strip() for k in kind.split(",") if k.strip()]:
+        if name == "csv":
+            sinks.append(CsvResultSink(os.path.join(data_folder, "ergebnisse.csv"), fsync=fsync))
+        elif name == "sqlite":
+            sink = SqliteResultSink(os.path.join(data_folder, "ergebnisse.sqlite"), fsync=fsync)
+            sink.backfill_from_csv(os.path.join(data_folder, "ergebnisse.csv"))
+            sinks.append(sink)
+        elif name == "parquet":
+            sinks.append(ParquetResultSink(os.path.join(data_folder, "ergebnisse_parquet")))
+        else:
+            raise ValueError(f"Unbekannter Ergebnis-Speicher: {name}")
+    return sinks[0] if len(sinks) == 1 else MultiSink(sinks)
+
+
+class BufferedResultWriter:
+    """
+    Write-behind für save_result(): Antworten landen in einer Queue, ein einzelner
+    Writer-Thread schreibt sie gesammelt weg – spätestens nach flush_interval
+    Sekunden oder sobald flush_size Zeilen beisammen sind. Ein Klick wartet damit
+    nie auf die Platte, und pro Prozess gibt es genau einen Schreiber.
+    """
+
+    def __init__(self, sink, flush_interval=1.0, flush_size=50):
+        self.sink = sink
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._queue = queue.Queue()
+        self._pending = []
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, row):
+        self._queue.put(dict(row))
+
+    def read_session(self, session_id):
+        """Zeilen einer Session – vorher wird der Puffer geleert, damit nichts fehlt."""
+        self.flush()
+        return self.sink.read_session(session_id)
+
+    def flush(self, timeout=10.0):
+        """Blockiert, bis alle bisher übergebenen Zeilen geschrieben sind."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=10.0)
+        self.sink.close()
+
+    def _write_pending(self):
+        if not self._pending and not self.sink.has_backlog():
+            return True
+        try:
+            with METRICS.timed("result_write"):
+                self.sink.write_rows(self._pending)
+            METRICS.count("result_rows", len(self._pending))
+        except PartialWriteError as e:
+            # Der Sink hat die Zeilen für die fehlgeschlagenen Ziele vorgemerkt -> nur diese nachholen
+            logger.error("Ergebnisse nicht in allen Speichern geschrieben (%s) – wird nachgeholt", e)
+            self._pending = []
+            return False
+        except Exception:
+            # Zeilen bleiben im Puffer und werden beim nächsten Flush erneut versucht
+            logger.exception("Ergebnisse konnten nicht geschrieben werden (%d Zeilen)", len(self._pending))
+            return False
+        self._pending = []
+        return True
+
+    def _run(self):
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+            if item is None:
+                self._write_pending()
+                return
+            if isinstance(item, threading.Event):
+                self._write_pending()
+                item.set()
+                continue
+            if item is not False:
+                self._pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if len(self._pending) >= self.flush_size or (deadline is not None and time.monotonic() >= deadline):
+                ok = self._write_pending()
+                deadline = None if ok else time.monotonic() + self.flush_interval
+
+
+# ==========================================================
+# 📋 ZUSAMMENFASSUNGEN (eine Zeile pro Session statt einer Datei pro Render)
+# ==========================================================
+SUMMARY_COLUMNS = ["SessionID", "ID", "Gruppe", "Accuracy", "AUC", "Antworten", "Zeitstempel"]
+
+
+class SummaryStore:
+    """Tabelle 'summaries' in ergebnisse.sqlite, Upsert per SessionID (idempotent)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "SessionID TEXT PRIMARY KEY, ID TEXT, Gruppe TEXT, Accuracy REAL, AUC REAL, "
+            "Antworten INTEGER, Zeitstempel TEXT)"
+        )
+        self._conn.commit()
+
+    def upsert(self, summary):
+        cols = ", ".join(SUMMARY_COLUMNS)
+        marks = ", ".join("?" for _ in SUMMARY_COLUMNS)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in SUMMARY_COLUMNS[1:])
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO summaries ({cols}) VALUES ({marks}) ON CONFLICT(SessionID) DO UPDATE SET {updates}",
+                tuple(summary.get(c) for c in SUMMARY_COLUMNS),
+            )
+
+    def rows(self):
+        with self._lock:
+            cur = self._conn.execute(f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM summaries ORDER BY Zeitstempel")
+            return [dict(zip(SUMMARY_COLUMNS, row)) for row in cur.fetchall()]
+
+    def import_legacy_files(self, folder):
+        """
+        Übernimmt alte summary_<ID>_<Datum>.csv-Dateien. Sie haben keine SessionID;
+        als Schlüssel dient 'legacy:<ID>', d.h. Duplikate einer ID werden zusammengeführt.
+        """
+        imported = 0
+        for name in sorted(os.listdir(folder)):
+            if not (name.startswith("summary_") and name.endswith(".csv")):
+                continue
+            with open(os.path.join(folder, name), encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f, delimiter=CSV_SEP):
+                    try:
+                        stamp = datetime.strptime("_".join(name[:-4].rsplit("_", 2)[-2:]), "%Y%m%d_%H%M")
+                        stamp = stamp.strftime("%Y-%m-%d %H:%M:%S")
+                    except ValueError:
+                        stamp = None
+                    self.upsert({
+                        "SessionID": f"legacy:{row.get('ID')}",
+                        "ID": row.get("ID"),
+                        "Gruppe": row.get("Gruppe"),
+                        "Accuracy": float(row["Accuracy"]) if row.get("Accuracy") else None,
+                        "AUC": float(row["AUC"]) if row.get("AUC") else None,
+                        "Zeitstempel": stamp,
+                    })
+                    imported += 1
+        return imported
+
+
+def main(argv=None):
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Export der Forscher-Zusammenfassungen")
+    parser.add_argument("--data", default="studien_daten", help="Datenordner (Standard: studien_daten)")
+    parser.add_argument("--out", help="Ziel-CSV (Standard: stdout)")
+    parser.add_argument("--import-legacy", action="store_true",
+                        help="vorher alte summary_*.csv-Dateien in die Tabelle übernehmen")
+    args = parser.parse_args(argv)
+
+    store = SummaryStore(os.path.join(args.data, "ergebnisse.sqlite"))
+    if args.import_legacy:
+        print(f"{store.import_legacy_files(args.data)} alte Zusammenfassungen übernommen", file=sys.stderr)
+    out = open(args.out, "w", encoding="utf-8", newline="") if args.out else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=SUMMARY_COLUMNS, delimiter=CSV_SEP)
+        writer.writeheader()
+        writer.writerows(store.rows())
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
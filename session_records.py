@@ -0,0 +1,84 @@
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+
+from result_store import RESULT_COLUMNS
+
+# ==========================================================
+# 🧾 KOMPAKTE SESSION-DATEN (statt Listen von Dicts / DataFrames)
+# ==========================================================
+TIMESTAMP_FORMAT = "%d.%m.%Y %H:%M:%S"
+
+
+def _intern(value):
+    # Gruppe, Label, Antwort und Dateinamen wiederholen sich ständig -> eine Kopie pro Prozess
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True)
+class Answer:
+    """
+    Eine Antwort ohne die Session-Felder (Testperson, Gruppe, SessionID), die
+    ohnehin für alle Antworten einer Session gleich sind. Zeitstempel als
+    Epoch-Sekunden, alle Strings interniert.
+    """
+    zeitstempel: float | None
+    video: str
+    antwort_user: str
+    korrektes_label: str
+    wahl_mapped: str
+    erfolg: int
+    zeit_bis_bewertung: float | None = None
+    abspieldauer: float | None = None
+
+    @classmethod
+    def from_row(cls, row):
+        """Aus einer Ergebnis-Zeile (CSV/SQLite, Spaltennamen wie in ergebnisse.csv)."""
+        try:
+            ts = datetime.strptime(str(row.get("Zeitstempel")), TIMESTAMP_FORMAT).timestamp()
+        except ValueError:
+            ts = None
+        dauer = row.get("Zeit_bis_Bewertung")
+        if dauer in (None, ""): dauer = row.get("Sichtdauer")  # Zeilen von vor der Umbenennung
+        try: dauer = None if dauer in (None, "") else float(dauer)
+        except (TypeError, ValueError): dauer = None
+        abgespielt = row.get("Abspieldauer")
+        try: abgespielt = None if abgespielt in (None, "") else float(abgespielt)
+        except (TypeError, ValueError): abgespielt = None
+        return cls(
+            zeitstempel=ts,
+            video=_intern(row.get("Video")),
+            antwort_user=_intern(row.get("Antwort_User")),
+            korrektes_label=_intern(row.get("Korrektes_Label")),
+            wahl_mapped=_intern(row.get("Wahl_Mapped")),
+            erfolg=int(row.get("Erfolg") or 0),
+            zeit_bis_bewertung=dauer,
+            abspieldauer=abgespielt,
+        )
+
+    def to_row(self, testperson, gruppe, session_id):
+        """Zurück in das Zeilenformat von ergebnisse.csv / Google Sheets."""
+        return {
+            "Zeitstempel": datetime.fromtimestamp(self.zeitstempel).strftime(TIMESTAMP_FORMAT) if self.zeitstempel is not None else None,
+            "Testperson": testperson,
+            "Gruppe": gruppe,
+            "SessionID": session_id,
+            "Video": self.video,
+            "Antwort_User": self.antwort_user,
+            "Korrektes_Label": self.korrektes_label,
+            "Erfolg": self.erfolg,
+            "Wahl_Mapped": self.wahl_mapped,
+            "Zeit_bis_Bewertung": self.zeit_bis_bewertung,
+            "Abspieldauer": self.abspieldauer,
+        }
+
+
+def answers_to_rows(answers, testperson, gruppe, session_id):
+    return [a.to_row(testperson, gruppe, session_id) for a in answers]
+
+
+def answers_frame(answers, testperson, gruppe, session_id):
+    """DataFrame erst dann bauen, wenn wirklich Metriken berechnet werden."""
+    import pandas as pd
+    rows = answers_to_rows(answers, testperson, gruppe, session_id)
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
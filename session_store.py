@@ -0,0 +1,87 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ==========================================================
+# 🔗 GETEILTER SESSION-ZUSTAND (für mehrere Prozesse auf einem Rechner)
+# ==========================================================
+# st.session_state lebt nur im Prozess, der die Session gerade bedient. Damit ein
+# Restore-Link (?sid=...) in jedem Prozess funktioniert, liegen Fortschritt und
+# bisherige Antworten zusätzlich hier – per SessionID, für alle Prozesse lesbar.
+
+
+class SessionStore:
+    """Fortschritt (ein Dict) und Antworten (Zeilen nach Video-Index) je SessionID."""
+
+    def save_progress(self, session_id, progress):
+        raise NotImplementedError
+
+    def load_progress(self, session_id):
+        """Zuletzt gespeicherter Fortschritt oder None."""
+        raise NotImplementedError
+
+    def add_answer(self, session_id, index, row):
+        """Antwort zum Video index (idempotent: dieselbe Position wird überschrieben)."""
+        raise NotImplementedError
+
+    def answers(self, session_id):
+        """Alle Antworten der Session, sortiert nach Video-Index."""
+        raise NotImplementedError
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    SQLite (WAL) im gemeinsamen Datenordner, für mehrere Prozesse auf einem
+    Rechner. WAL braucht Shared Memory und gehört nicht auf ein Netzlaufwerk.
+    synchronous=NORMAL: kein fsync pro Klick; ein Stromausfall kann die letzten
+    Einträge kosten, die Ergebnisse selbst stehen ohnehin im Ergebnis-Sink.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_progress (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_answers ("
+            "session_id TEXT NOT NULL, idx INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (session_id, idx))"
+        )
+        self._conn.commit()
+
+    def save_progress(self, session_id, progress):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO session_progress VALUES (?, ?, ?)",
+                (session_id, json.dumps(progress, default=str), time.time()),
+            )
+
+    def load_progress(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM session_progress WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_answer(self, session_id, index, row):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO session_answers VALUES (?, ?, ?)",
+                (session_id, int(index), json.dumps(row, default=str)),
+            )
+
+    def answers(self, session_id):
+        with self._lock:
+            cur = self._conn.execute("SELECT data FROM session_answers WHERE session_id = ? ORDER BY idx", (session_id,))
+            return [json.loads(row[0]) for row in cur.fetchall()]
+
+
+def make_session_store(kind, data_folder):
+    """kind: "sqlite" (Datei im Datenordner) oder "none" (kein geteilter Zustand -> None)."""
+    if kind == "none":
+        return None
+    if kind == "sqlite":
+        return SqliteSessionStore(os.path.join(data_folder, "sessions.sqlite"))
+    raise ValueError(f"Unbekanntes Session-Backend: {kind}")
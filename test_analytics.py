@@ -0,0 +1,41 @@
+"""
+Tests für den inkrementellen Parquet-Snapshot der Auswertung.
+
+    python -m pytest -q
+"""
+import os
+
+import pandas as pd
+
+from analytics import SNAPSHOT_NAME, ResultFrame
+from result_store import SqliteResultSink
+
+
+def _row(i):
+    return {
+        "Zeitstempel": "01.01.2026 10:00:00", "Testperson": "1", "Gruppe": "g", "SessionID": "s1",
+        "Video": f"v{i}.mp4", "Antwort_User": "Echt", "Korrektes_Label": "real", "Erfolg": 1,
+        "Wahl_Mapped": "real", "Zeit_bis_Bewertung": 1.5,
+    }
+
+
+def test_incremental_load_reads_each_row_once(tmp_path):
+    sink = SqliteResultSink(str(tmp_path / "ergebnisse.sqlite"))
+    sink.write_rows([_row(i) for i in range(3)])
+    frame = ResultFrame(str(tmp_path))
+    assert len(frame.load()) == 3
+    sink.write_rows([_row(i) for i in range(3, 5)])
+    assert list(frame.load()["Video"]) == [f"v{i}.mp4" for i in range(5)]
+    assert len(frame.load()) == 5
+    sink.close()
+
+
+def test_snapshot_without_state_is_rebuilt(tmp_path):
+    sink = SqliteResultSink(str(tmp_path / "ergebnisse.sqlite"))
+    sink.write_rows([_row(i) for i in range(3)])
+    frame = ResultFrame(str(tmp_path))
+    os.makedirs(frame.cache_folder)
+    # Snapshot ohne Stand in den Metadaten (z.B. von einer älteren Version)
+    pd.DataFrame([_row(0)]).to_parquet(os.path.join(frame.cache_folder, SNAPSHOT_NAME), index=False)
+    assert len(frame.load()) == 3
+    sink.close()
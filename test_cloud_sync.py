@@ -0,0 +1,136 @@
+"""
+Tests für den Cloud-Upload gegen die lokale Ersatz-Tabelle (LocalSheetBackend).
+
+    python -m pytest -q
+"""
+import pytest
+
+from cloud_sync import (
+    DUPLICATE, UPLOADED, CircuitBreaker, CloudUnavailable, GSheetsBackend, LocalSheetBackend, SheetsUploader, UploadLog,
+)
+
+WORKSHEET = "Tabellenblatt1"
+
+
+def _rows(session_id, n=2):
+    return [{"SessionID": session_id, "Testperson": "1", "Video": f"v{i}.mp4"} for i in range(n)]
+
+
+def _uploader(tmp_path, backend, **kwargs):
+    log = UploadLog(str(tmp_path / "cloud_sync.sqlite"))
+    return SheetsUploader(backend, log, worksheet=WORKSHEET, base_delay=0, **kwargs)
+
+
+class FlakyAppendBackend(LocalSheetBackend):
+    """append_rows kommt an, meldet aber beim ersten Mal einen Fehler (z.B. Timeout)."""
+
+    def __init__(self, folder):
+        super().__init__(folder)
+        self.appends = 0
+
+    def append_rows(self, worksheet, rows):
+        super().append_rows(worksheet, rows)
+        self.appends += 1
+        if self.appends == 1:
+            raise TimeoutError("Antwort verloren")
+
+
+def test_retry_after_failures(tmp_path):
+    backend = LocalSheetBackend(str(tmp_path / "sheet"), fail_next=2)
+    uploader = _uploader(tmp_path, backend)
+    assert uploader.upload_session("s1", _rows("s1")) == UPLOADED
+    assert len(backend.read_rows(WORKSHEET)) == 2
+
+
+def test_second_upload_is_duplicate(tmp_path):
+    backend = LocalSheetBackend(str(tmp_path / "sheet"))
+    uploader = _uploader(tmp_path, backend)
+    uploader.upload_session("s1", _rows("s1"))
+    assert uploader.upload_session("s1", _rows("s1")) == DUPLICATE
+    assert len(backend.read_rows(WORKSHEET)) == 2
+
+
+def test_dedupe_against_sheet_without_local_log(tmp_path):
+    # Anderer Prozess bzw. verlorener Dedupe-Cache: die SessionID-Spalte entscheidet
+    backend = LocalSheetBackend(str(tmp_path / "sheet"))
+    backend.append_rows(WORKSHEET, _rows("s1"))
+    uploader = _uploader(tmp_path, backend)
+    assert uploader.upload_many({"s1": _rows("s1"), "s2": _rows("s2")}) == {"s1": DUPLICATE, "s2": UPLOADED}
+    assert sorted(r["SessionID"] for r in backend.read_rows(WORKSHEET)) == ["s1", "s1", "s2", "s2"]
+
+
+def test_append_that_arrived_is_not_repeated(tmp_path):
+    backend = FlakyAppendBackend(str(tmp_path / "sheet"))
+    uploader = _uploader(tmp_path, backend)
+    assert uploader.upload_session("s1", _rows("s1")) == UPLOADED
+    assert backend.appends == 1
+    assert len(backend.read_rows(WORKSHEET)) == 2
+
+
+def test_new_columns_extend_header(tmp_path):
+    backend = LocalSheetBackend(str(tmp_path / "sheet"))
+    backend.append_rows(WORKSHEET, _rows("s1", n=1))
+    backend.append_rows(WORKSHEET, [dict(_rows("s2", n=1)[0], Zeit_bis_Bewertung="3.5")])
+    rows = backend.read_rows(WORKSHEET)
+    assert [r["Zeit_bis_Bewertung"] for r in rows] == ["", "3.5"]
+
+
+def test_open_breaker_skips_backend(tmp_path):
+    backend = LocalSheetBackend(str(tmp_path / "sheet"), fail_next=10)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+    uploader = _uploader(tmp_path, backend, attempts=2, breaker=breaker)
+    with pytest.raises(ConnectionError):
+        uploader.upload_session("s1", _rows("s1"))
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CloudUnavailable):
+        uploader.upload_session("s1", _rows("s1"))
+    assert backend.fail_next == 8
+
+
+class FakeWorksheet:
+    def __init__(self, header):
+        self.values = [list(header)]
+        self.options = []
+
+    def row_values(self, i):
+        return self.values[i - 1]
+
+    def update(self, values, cell):
+        self.values[0] = values[0]
+
+    def append_rows(self, rows, value_input_option):
+        self.values.extend(rows)
+        self.options.append(value_input_option)
+
+
+class FakeConnection:
+    """Nur read/update – wie eine Verbindung ohne Service-Account-Client."""
+
+    def __init__(self):
+        import pandas as pd
+        self.data = pd.DataFrame()
+
+    def read(self, worksheet, ttl):
+        return self.data
+
+    def update(self, worksheet, data):
+        self.data = data
+
+
+def test_gsheets_appends_raw_values():
+    ws = FakeWorksheet(["SessionID", "Testperson"])
+    backend = GSheetsBackend(conn=object())
+    backend._worksheet = lambda worksheet: ws
+    backend.append_rows(WORKSHEET, [{"SessionID": "s1", "Testperson": "007", "Video": "v.mp4"}])
+    assert ws.options == ["RAW"]
+    assert ws.values == [["SessionID", "Testperson", "Video"], ["s1", "007", "v.mp4"]]
+
+
+def test_gsheets_legacy_fallback_is_logged(caplog):
+    conn = FakeConnection()
+    backend = GSheetsBackend(conn=conn)
+    with caplog.at_level("WARNING", logger="cloud_sync"):
+        backend.append_rows(WORKSHEET, _rows("s1"))
+        backend.append_rows(WORKSHEET, _rows("s2"))
+    assert len(conn.data) == 4
+    assert sum("read/concat/update" in r.message for r in caplog.records) == 1
@@ -0,0 +1,59 @@
+"""
+Tests für die ID-Vergabe und die Gruppen-Zuteilung (mehrere Prozesse, eine Datei).
+
+    python -m pytest -q
+"""
+import multiprocessing
+
+import pytest
+
+from id_allocator import FileCounterBackend, GroupBalancer, IdAllocator, SqliteCounterBackend
+
+MAPPING = {0: "a", 1: "b", 2: "c"}
+BACKENDS = {"sqlite": (SqliteCounterBackend, "zuteilung.sqlite"), "file": (FileCounterBackend, "testperson_id.txt")}
+
+
+def _draw_ids(kind, folder, n, barrier, queue):
+    cls, name = BACKENDS[kind]
+    allocator = IdAllocator(cls(f"{folder}/{name}"), block_size=3)
+    barrier.wait()
+    queue.put([allocator.next_id() for _ in range(n)])
+
+
+@pytest.mark.parametrize("kind", sorted(BACKENDS))
+def test_ids_unique_across_processes(tmp_path, kind):
+    ctx = multiprocessing.get_context("spawn")
+    barrier, queue = ctx.Barrier(4), ctx.Queue()
+    procs = [ctx.Process(target=_draw_ids, args=(kind, str(tmp_path), 25, barrier, queue)) for _ in range(4)]
+    for p in procs: p.start()
+    ids = [i for _ in procs for i in queue.get(timeout=60)]
+    for p in procs: p.join()
+    assert all(p.exitcode == 0 for p in procs)
+    assert len(ids) == 100 and len(set(ids)) == 100
+
+
+def test_advance_drops_reserved_ids_below(tmp_path):
+    allocator = IdAllocator(SqliteCounterBackend(str(tmp_path / "zuteilung.sqlite")), block_size=10)
+    assert allocator.next_id() == 1
+    allocator.advance_to(40)
+    assert allocator.next_id() == 41
+
+
+def test_balancer_counts_running_sessions(tmp_path):
+    balancer = GroupBalancer(str(tmp_path / "zuteilung.sqlite"))
+    # Noch keine Session abgeschlossen: laufende zählen, sonst landen alle in "a"
+    assert [balancer.assign(f"s{i}", MAPPING, preferred=0) for i in range(4)] == ["a", "b", "c", "a"]
+
+
+def test_balancer_ignores_stale_sessions(tmp_path):
+    balancer = GroupBalancer(str(tmp_path / "zuteilung.sqlite"), stale_seconds=0)
+    assert [balancer.assign(f"s{i}", MAPPING, preferred=1) for i in range(3)] == ["b", "b", "b"]
+
+
+def test_balancer_complete_is_counted_once(tmp_path):
+    balancer = GroupBalancer(str(tmp_path / "zuteilung.sqlite"), stale_seconds=0)
+    balancer.assign("s1", MAPPING, preferred=0)
+    balancer.complete("s1", "a")
+    balancer.complete("s1", "a")
+    balancer.complete("alt", "b")  # vor dem Update gestartet, trotzdem einmal gezählt
+    assert balancer.assign("s2", MAPPING, preferred=0) == "c"
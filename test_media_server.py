@@ -0,0 +1,98 @@
+"""
+Tests für den Media-Server (Range, If-Range, 304, 416, HEAD) gegen einen echten Socket.
+
+    python -m pytest -q
+"""
+import http.client
+
+import pytest
+
+from media_server import URL_PREFIX, start_media_server
+
+KEY = "0123456789abcdef"
+DATA = bytes(range(256)) * 4  # 1024 Bytes
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "videos" / "real").mkdir(parents=True)
+    (tmp_path / "videos" / "real" / "clip.mp4").write_bytes(DATA)
+    (tmp_path / "geheim.txt").write_text("nicht ausliefern")
+    paths = {KEY: "real/clip.mp4", "f" * 16: "../geheim.txt", "e" * 16: "real/fehlt.mp4"}
+    srv = start_media_server(str(tmp_path / "videos"), paths.get, port=0)
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _request(server, headers=None, method="GET", key=KEY):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    conn.request(method, f"{URL_PREFIX}{key}.mp4", headers=headers or {})
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    return resp, body
+
+
+def test_full_file(server):
+    resp, body = _request(server)
+    assert resp.status == 200 and body == DATA
+    assert resp.getheader("Accept-Ranges") == "bytes"
+    assert resp.getheader("Content-Type") == "video/mp4"
+    assert resp.getheader("Content-Length") == str(len(DATA))
+
+
+@pytest.mark.parametrize("range_header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),  # Ende hinter der Datei wird gekürzt
+    ("bytes=-100", 924, 1023),       # Suffix: die letzten 100 Bytes
+    ("bytes=-5000", 0, 1023),        # Suffix länger als die Datei
+])
+def test_partial_content(server, range_header, start, end):
+    resp, body = _request(server, {"Range": range_header})
+    assert resp.status == 206
+    assert resp.getheader("Content-Range") == f"bytes {start}-{end}/{len(DATA)}"
+    assert body == DATA[start:end + 1]
+
+
+@pytest.mark.parametrize("range_header", ["bytes=1024-", "bytes=20-10", "bytes=-0"])
+def test_unsatisfiable_range(server, range_header):
+    resp, body = _request(server, {"Range": range_header})
+    assert resp.status == 416 and body == b""
+    assert resp.getheader("Content-Range") == f"bytes */{len(DATA)}"
+
+
+def test_multiple_ranges_send_whole_file(server):
+    resp, body = _request(server, {"Range": "bytes=0-1,5-6"})
+    assert resp.status == 200 and body == DATA
+
+
+def test_if_range(server):
+    etag = _request(server, method="HEAD")[0].getheader("ETag")
+    resp, body = _request(server, {"Range": "bytes=0-9", "If-Range": etag})
+    assert resp.status == 206 and body == DATA[:10]
+    # Veraltete Version beim Client -> ganze Datei statt eines Stücks der neuen
+    resp, body = _request(server, {"Range": "bytes=0-9", "If-Range": '"alt"'})
+    assert resp.status == 200 and body == DATA
+
+
+def test_not_modified(server):
+    etag = _request(server)[0].getheader("ETag")
+    resp, body = _request(server, {"If-None-Match": etag})
+    assert resp.status == 304 and body == b""
+    assert resp.getheader("ETag") == etag
+
+
+def test_head(server):
+    resp, body = _request(server, method="HEAD")
+    assert resp.status == 200 and body == b""
+    assert resp.getheader("Content-Length") == str(len(DATA))
+    resp, body = _request(server, {"Range": "bytes=0-9"}, method="HEAD")
+    assert resp.status == 206 and body == b""
+    assert resp.getheader("Content-Length") == "10"
+
+
+@pytest.mark.parametrize("key", ["1" * 16, "f" * 16, "e" * 16, "kein-schluessel"])
+def test_unknown_or_outside_paths(server, key):
+    assert _request(server, key=key)[0].status == 404
@@ -0,0 +1,159 @@
+"""
+Tests für die Ergebnis-Speicher (CSV/SQLite, MultiSink, gepufferter Writer).
+
+    python -m pytest -q
+"""
+import csv
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from result_store import (
+    CSV_SEP, RESULT_COLUMNS, BufferedResultWriter, CsvResultSink, MultiSink, PartialWriteError, ResultSink,
+    SqliteResultSink, make_result_sink,
+)
+
+
+def _row(session_id, i):
+    return {
+        "Zeitstempel": "01.01.2026 10:00:00", "Testperson": "1", "Gruppe": "g", "SessionID": session_id,
+        "Video": f"v{i}.mp4", "Antwort_User": "Echt", "Korrektes_Label": "real", "Erfolg": 1,
+        "Wahl_Mapped": "real", "Zeit_bis_Bewertung": 1.5,
+    }
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class RecordingSink(ResultSink):
+    """Merkt sich jeden Batch; die ersten fail_next Aufrufe schlagen fehl."""
+
+    def __init__(self, fail_next=0):
+        self.batches = []
+        self.fail_next = fail_next
+
+    def write_rows(self, rows):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise OSError("Platte voll")
+        self.batches.append([row["Video"] for row in rows])
+
+    def read_session(self, session_id):
+        return [{"Video": v} for batch in self.batches for v in batch]
+
+
+def test_multisink_replays_backlog_only_for_failed_sink():
+    ok, flaky = RecordingSink(), RecordingSink(fail_next=1)
+    sink = MultiSink([ok, flaky])
+    with pytest.raises(PartialWriteError):
+        sink.write_rows([_row("s1", 0)])
+    assert sink.has_backlog()
+    sink.write_rows([_row("s1", 1)])
+    assert ok.batches == [["v0.mp4"], ["v1.mp4"]]
+    assert flaky.batches == [["v0.mp4", "v1.mp4"]]
+    assert not sink.has_backlog()
+
+
+def test_multisink_reads_from_complete_sink():
+    ok, flaky = RecordingSink(), RecordingSink(fail_next=1)
+    sink = MultiSink([flaky, ok])
+    with pytest.raises(PartialWriteError):
+        sink.write_rows([_row("s1", 0)])
+    assert sink.read_session("s1") == [{"Video": "v0.mp4"}]
+
+
+def test_writer_replays_backlog_without_new_rows():
+    ok, flaky = RecordingSink(), RecordingSink(fail_next=1)
+    writer = BufferedResultWriter(MultiSink([ok, flaky]), flush_interval=60)
+    writer.submit(_row("s1", 0))
+    writer.flush()
+    assert flaky.batches == []
+    writer.flush()
+    writer.close()
+    assert ok.batches == [["v0.mp4"]] and flaky.batches == [["v0.mp4"]]
+
+
+def test_writer_flushes_on_size():
+    sink = RecordingSink()
+    writer = BufferedResultWriter(sink, flush_interval=60, flush_size=3)
+    for i in range(5):
+        writer.submit(_row("s1", i))
+    assert _wait_for(lambda: sink.batches)
+    time.sleep(0.2)
+    assert sink.batches == [["v0.mp4", "v1.mp4", "v2.mp4"]]
+    writer.close()
+    assert sink.batches[-1] == ["v3.mp4", "v4.mp4"]
+
+
+def test_writer_flushes_on_interval():
+    sink = RecordingSink()
+    writer = BufferedResultWriter(sink, flush_interval=0.3, flush_size=100)
+    writer.submit(_row("s1", 0))
+    writer.submit(_row("s1", 1))
+    assert sink.batches == []
+    assert _wait_for(lambda: sink.batches)
+    assert sink.batches == [["v0.mp4", "v1.mp4"]]
+    writer.close()
+
+
+def test_writer_keeps_rows_after_failure():
+    sink = RecordingSink(fail_next=1)
+    writer = BufferedResultWriter(sink, flush_interval=0.1, flush_size=100)
+    writer.submit(_row("s1", 0))
+    assert _wait_for(lambda: sink.batches)
+    assert sink.batches == [["v0.mp4"]]
+    writer.close()
+
+
+def test_csv_header_migration(tmp_path):
+    path = tmp_path / "ergebnisse.csv"
+    old_columns = RESULT_COLUMNS[:9] + ["Sichtdauer"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=old_columns, delimiter=CSV_SEP)
+        writer.writeheader()
+        writer.writerow({c: _row("alt", 0).get(c, "4.5") for c in old_columns})
+    CsvResultSink(str(path)).write_rows([dict(_row("neu", 1), Abspieldauer=2.0)])
+    with open(path, encoding="utf-8", newline="") as f:
+        assert next(csv.reader(f, delimiter=CSV_SEP)) == RESULT_COLUMNS
+    sink = CsvResultSink(str(path))
+    assert sink.read_session("alt")[0]["Zeit_bis_Bewertung"] == 4.5
+    assert sink.read_session("neu")[0]["Abspieldauer"] == 2.0
+
+
+def test_sqlite_column_migration(tmp_path):
+    path = tmp_path / "ergebnisse.sqlite"
+    old_columns = RESULT_COLUMNS[:9] + ["Sichtdauer"]
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE ergebnisse (%s)" % ", ".join(f'"{c}"' for c in old_columns))
+        conn.execute("INSERT INTO ergebnisse VALUES (%s)" % ", ".join("?" for _ in old_columns),
+                     [_row("alt", 0).get(c) for c in old_columns[:9]] + [4.5])
+    sink = SqliteResultSink(str(path))
+    assert sink.read_session("alt")[0]["Zeit_bis_Bewertung"] == 4.5
+    assert sink.read_session("alt")[0]["Abspieldauer"] is None
+    sink.close()
+
+
+def _open_sinks(folder, barrier):
+    barrier.wait()
+    make_result_sink("csv,sqlite", folder).close()
+
+
+def test_backfill_runs_once_across_processes(tmp_path):
+    with open(tmp_path / "ergebnisse.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, delimiter=CSV_SEP)
+        writer.writeheader()
+        writer.writerows(_row("s1", i) for i in range(2000))
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(3)
+    procs = [ctx.Process(target=_open_sinks, args=(str(tmp_path), barrier)) for _ in range(3)]
+    for p in procs: p.start()
+    for p in procs: p.join()
+    assert all(p.exitcode == 0 for p in procs)
+    conn = sqlite3.connect(tmp_path / "ergebnisse.sqlite")
+    assert conn.execute("SELECT COUNT(*) FROM ergebnisse").fetchone()[0] == 2000
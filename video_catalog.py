@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+
+# ==========================================================
+# 🎞️ VIDEO-KATALOG (persistenter Index statt Ordner-Scan pro Session)
+# ==========================================================
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+LABEL_FOLDERS = ("Real", "Fake")
+HASH_CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = "manifest.json"  # von normalize_videos.py pro Gruppenordner geschrieben
+
+# Bekannte Deepfake-Generatoren (Präfix des Dateinamens)
+GENERATORS = ["VidnozAI", "beArt", "RemakerAI", "vidwud", "VidMage", "aifaceswap.io", "viggle.ai"]
+REAL_GENERATOR = "Echt"
+_GENERATOR_RE = re.compile("^(" + "|".join(re.escape(g) for g in GENERATORS) + ")", re.IGNORECASE)
+_CANONICAL = {g.lower(): g for g in GENERATORS}
+
+
+def generator_from_filename(filename, label):
+    """Generator eines Clips aus dem Dateinamen; echte Videos -> 'Echt'."""
+    if str(label).lower() == "real":
+        return REAL_GENERATOR
+    m = _GENERATOR_RE.match(str(filename))
+    if m:
+        return _CANONICAL[m.group(1).lower()]
+    # Unbekannt: alles vor der ersten Ziffer bzw. dem ersten Punkt
+    return re.split(r"[.\d_-]", str(filename), maxsplit=1)[0] or "unbekannt"
+
+
+def media_key(entry):
+    """
+    Undurchsichtiger Schlüssel eines Clips für URLs (Media-Server): verrät weder
+    Label noch Generator, anders als der Pfad. Basis ist der Inhalts-Hash.
+    """
+    basis = entry.get("sha256") or f'{entry["full_path"]}:{entry["size"]}:{entry["mtime"]}'
+    return hashlib.sha256(f"clip:{basis}".encode()).hexdigest()[:32]
+
+
+def file_sha256(path):
+    """SHA-256 einer Datei, blockweise gelesen (Videos passen nicht immer in den RAM)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_video(path):
+    """Liest Dauer (Sekunden) und Video-Codec per ffprobe. Ohne ffprobe -> (None, None)."""
+    if shutil.which("ffprobe") is None:
+        return None, None
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=codec_name:format=duration", "-of", "json", path],
+            capture_output=True, text=True, timeout=30, check=True,
+        ).stdout
+        info = json.loads(out)
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return None, None
+    streams = info.get("streams") or [{}]
+    duration = info.get("format", {}).get("duration")
+    try: duration = round(float(duration), 3)
+    except (TypeError, ValueError): duration = None
+    return duration, streams[0].get("codec_name")
+
+
+class VideoCatalog:
+    """
+    Persistenter Index über 'videos/GRUPPE/Real' und 'videos/GRUPPE/Fake'.
+
+    Pro Label-Ordner wird die mtime gemerkt. Ein refresh() kostet im Normalfall nur
+    ein os.stat() je Ordner; nur Ordner mit geänderter mtime werden neu gelistet,
+    und auch dort werden Hash/ffprobe nur für Dateien mit neuer Größe/mtime berechnet.
+    Der Index liegt zusätzlich als JSON-Manifest auf der Platte, damit ein
+    Neustart des Servers nicht alle Videos neu hashen muss.
+
+    Hinweis: Wird eine Datei *am selben Namen* überschrieben, ändert sich die
+    Ordner-mtime nicht -> dann refresh(force=True) aufrufen.
+    """
+
+    def __init__(self, video_root, folder_mapping, manifest_path=None):
+        self.video_root = video_root
+        self.folder_mapping = dict(folder_mapping)
+        self.manifest_path = manifest_path
+        self.version = 0
+        self._lock = threading.Lock()
+        self._dirs = {}      # "ordner/Label" -> {"mtime": int, "files": {dateiname: eintrag}}
+        self._entries = None
+        self._by_key = {}    # media_key -> full_path
+        self._load_manifest()
+
+    # ---------- Manifest ----------
+    def _load_manifest(self):
+        if not self.manifest_path or not os.path.isfile(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Anderer Ordner oder geändertes Gruppen-Mapping -> Manifest verwerfen
+        if data.get("video_root") == os.path.abspath(self.video_root) and data.get("mapping") == self.folder_mapping:
+            self._dirs = data.get("dirs", {})
+
+    def _save_manifest(self):
+        if not self.manifest_path:
+            return
+        tmp = self.manifest_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"video_root": os.path.abspath(self.video_root), "mapping": self.folder_mapping, "dirs": self._dirs}, f)
+            os.replace(tmp, self.manifest_path)
+        except OSError:
+            pass
+
+    # ---------- Scan ----------
+    def _group_manifest(self, folder_name):
+        """Clip-Daten aus dem manifest.json der Normalisierung (falls vorhanden)."""
+        try:
+            with open(os.path.join(self.video_root, folder_name, MANIFEST_NAME), encoding="utf-8") as f:
+                return json.load(f).get("clips", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _scan_label_dir(self, folder_name, label, label_path, mtime, cached):
+        old_files = cached["files"] if cached else {}
+        manifest = None
+        files = {}
+        for file in os.listdir(label_path):
+            if not file.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            path = os.path.join(label_path, file)
+            try: info = os.stat(path)
+            except OSError: continue
+            old = old_files.get(file)
+            if old and old["size"] == info.st_size and old["mtime"] == info.st_mtime_ns:
+                files[file] = old
+                continue
+            if manifest is None:
+                manifest = self._group_manifest(folder_name)
+            clip = manifest.get(f"{label}/{file}")
+            if clip and clip.get("size") == info.st_size and clip.get("mtime") == info.st_mtime_ns:
+                # Schon von normalize_videos.py vermessen -> kein ffprobe, kein Hash
+                duration, codec, bitrate, sha256 = clip.get("duration"), clip.get("codec"), clip.get("bitrate"), clip.get("sha256")
+            else:
+                duration, codec = probe_video(path)
+                bitrate = int(info.st_size * 8 / duration) if duration else None
+                sha256 = file_sha256(path)
+            files[file] = {
+                "filename": file,
+                # Pfad relativ zum videos-Ordner (wie bisher)
+                "full_path": os.path.join(folder_name, label, file),
+                "label": label.lower(),
+                "gruppe": self.folder_mapping[folder_name],
+                "size": info.st_size,
+                "mtime": info.st_mtime_ns,
+                "duration": duration,
+                "codec": codec,
+                "bitrate": bitrate,
+                "sha256": sha256,
+            }
+        return {"mtime": mtime, "files": files}
+
+    def refresh(self, force=False):
+        """Aktualisiert den Index inkrementell und liefert die Liste aller Einträge."""
+        with self._lock:
+            changed = False
+            seen = set()
+            for folder_name in self.folder_mapping:
+                for label in LABEL_FOLDERS:
+                    key = f"{folder_name}/{label}"
+                    label_path = os.path.join(self.video_root, folder_name, label)
+                    try:
+                        mtime = os.stat(label_path).st_mtime_ns
+                    except OSError:
+                        continue
+                    seen.add(key)
+                    cached = self._dirs.get(key)
+                    if not force and cached and cached["mtime"] == mtime:
+                        continue
+                    self._dirs[key] = self._scan_label_dir(folder_name, label, label_path, mtime, cached)
+                    changed = True
+            for key in set(self._dirs) - seen:
+                del self._dirs[key]
+                changed = True
+            if changed:
+                self._save_manifest()
+                self._entries = None
+                self.version += 1
+            if self._entries is None:
+                self._entries = [
+                    entry
+                    for key in sorted(self._dirs)
+                    for _, entry in sorted(self._dirs[key]["files"].items())
+                ]
+                # Gemeinsame String-Objekte mit den Antworten der Sessions (session_records)
+                for entry in self._entries:
+                    for field in ("filename", "label", "gruppe"):
+                        entry[field] = sys.intern(entry[field])
+                    entry["media_key"] = media_key(entry)
+                self._by_key = {entry["media_key"]: entry["full_path"] for entry in self._entries}
+            return self._entries
+
+    def path_for_key(self, key):
+        """full_path (relativ zum videos-Ordner) zu einem media_key – None, wenn es keinen solchen Clip gibt."""
+        if self._entries is None:
+            self.refresh()
+        return self._by_key.get(key)